@@ -0,0 +1,65 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Checks of util/stat_interpreters.py against a small Ruby stats file.
+
+Usage
+-----
+
+python3 -m pytest tests
+
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+# util is set up by conftest.py
+from util.stat_interpreters import HistogramStat, StatsIndex, VectorStat
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "ruby-stats.txt"
+RUBY = "board.cache_hierarchy.ruby_system"
+
+
+def test_oneline_histogram():
+    stat = HistogramStat(f"{RUBY}.m_missLatencyHistSeqr")
+    stat.set_value_from_stats_index(StatsIndex.from_path(FIXTURE))
+    histogram = stat.get_value()
+    assert np.array_equal(histogram.edges, np.arange(11) * 32)
+    assert histogram.counts.tolist() == [100, 400, 300, 150, 40, 10] + [0] * 4
+    assert histogram.samples == 1000
+    assert histogram.mean == 52.48
+    # Half of the samples are below the end of the second bucket.
+    assert histogram.percentile(50) == 64
+    assert histogram.percentile(99) == 160
+
+
+def test_vector():
+    stat = VectorStat(f"{RUBY}.network.msg_count")
+    stat.set_value_from_stats_index(StatsIndex.from_path(FIXTURE))
+    assert stat.get_value()["Data"] == 1500
+    assert stat.get_value().total == 3500
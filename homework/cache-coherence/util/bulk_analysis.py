@@ -0,0 +1,188 @@
+# Copyright (c) 2022 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Extract stats from many result directories in parallel.
+
+Every directory with a `stats.txt` file under the given paths (e.g., one
+output directory per workload variant and core count, or the per-simulation
+directories multisim writes into `m5out`) is parsed by its own worker
+process. The results are merged into one table with one row per directory.
+
+Usage
+-----
+
+```sh
+python3 -m util.bulk_analysis results/ \
+    --root-stat simSeconds \
+    --aggregate-stat m_demand_hits --aggregate-stat m_demand_misses \
+    --output results.csv
+```
+
+```python
+from util.bulk_analysis import analyze_directories, find_result_dirs
+from util.stat_interpreters import AggregateStat, RootStat
+
+rows = analyze_directories(
+    find_result_dirs(["results"]),
+    [RootStat("simSeconds"), AggregateStat("m_demand_misses")],
+)
+```
+"""
+
+import argparse
+import csv
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .stat_interpreters import (
+    AggregateStat,
+    GlobStat,
+    RootStat,
+    Stat,
+    StatsIndex,
+)
+
+
+def find_result_dirs(paths: Iterable[str]) -> List[Path]:
+    """
+    Find all of the directories with a stats.txt file under `paths`.
+    """
+    result_dirs = set()
+    for path in paths:
+        for stats_file in Path(path).rglob("stats.txt"):
+            result_dirs.add(stats_file.parent)
+    return sorted(result_dirs)
+
+
+def analyze_directory(result_dir: Path, stats: List[Stat]) -> Dict[str, Any]:
+    """
+    Read `stats` from the stats file in `result_dir`.
+
+    Stats that are not in the file are None in the returned row instead of
+    failing the whole analysis.
+    """
+    row = {"name": result_dir.name, "path": str(result_dir)}
+    stats_index = StatsIndex.from_path(result_dir / "stats.txt")
+    for stat in stats:
+        try:
+            stat.set_value_from_stats_index(stats_index)
+            row[stat.get_name()] = stat.get_value()
+        except ValueError:
+            row[stat.get_name()] = None
+    return row
+
+
+def analyze_directories(
+    result_dirs: List[Path],
+    stats: List[Stat],
+    max_workers: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Read `stats` from every directory in `result_dirs` in parallel.
+
+    :param result_dirs: Directories with a stats.txt file.
+    :param stats: Stats to read. Each worker gets its own copy.
+    :param max_workers: Maximum number of worker processes. Defaults to the
+    number of host cores.
+    :returns: One row per directory, in the same order as `result_dirs`.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(
+            executor.map(analyze_directory, result_dirs, repeat(stats))
+        )
+
+
+def write_table(rows: List[Dict[str, Any]], output: str) -> None:
+    """
+    Write the rows returned by `analyze_directories` as a CSV file.
+    """
+    columns = []
+    for row in rows:
+        for column in row:
+            if not column in columns:
+                columns.append(column)
+    with open(output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Extract stats from many result directories in parallel."
+    )
+    parser.add_argument(
+        "paths",
+        type=str,
+        nargs="+",
+        help="Directories to search for stats.txt files.",
+    )
+    parser.add_argument(
+        "--root-stat",
+        type=str,
+        action="append",
+        default=[],
+        help="Name of a stat to read as is, e.g., simSeconds.",
+    )
+    parser.add_argument(
+        "--aggregate-stat",
+        type=str,
+        action="append",
+        default=[],
+        help="Last name component of stats to sum, e.g., m_demand_hits.",
+    )
+    parser.add_argument(
+        "--glob-stat",
+        type=str,
+        action="append",
+        default=[],
+        help="Glob pattern of stats to sum, e.g., "
+        "'board.processor.cores[1-*].core.ipc'.",
+    )
+    parser.add_argument("--output", type=str, default="results.csv")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes. Defaults to the number of cores.",
+    )
+    args = parser.parse_args()
+
+    stats = (
+        [RootStat(name) for name in args.root_stat]
+        + [AggregateStat(name) for name in args.aggregate_stat]
+        + [GlobStat(pattern) for pattern in args.glob_stat]
+    )
+    if not stats:
+        stats = [RootStat("simSeconds"), RootStat("simInsts")]
+
+    result_dirs = find_result_dirs(args.paths)
+    rows = analyze_directories(result_dirs, stats, args.jobs)
+    write_table(rows, args.output)
+    print(f"Wrote {len(rows)} rows to {args.output}")
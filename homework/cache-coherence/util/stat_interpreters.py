@@ -24,8 +24,378 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from typing import Any
+import os
+import re
 from abc import abstractmethod
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Stats of the extra core that HWO3CPU adds (see README.md). These are
+# excluded from aggregate stats by default.
+DEFAULT_EXCLUDES = (
+    "board.processor.cores0.**",
+    "board.cache_hierarchy.ruby_system.l1_controllers0.**",
+)
+
+_BUCKET_PATTERN = re.compile(
+    r"^(-?\d+(?:\.\d+)?(?:e[+-]?\d+)?)(?:-(-?\d+(?:\.\d+)?(?:e[+-]?\d+)?))?$"
+)
+_DISTRIBUTION_SUMMARY = (
+    "samples",
+    "mean",
+    "gmean",
+    "stdev",
+    "underflows",
+    "overflows",
+    "min_value",
+    "max_value",
+    "total",
+)
+
+_RANGE_PATTERN = re.compile(r"\[(\d+)-(\d+|\*)\]")
+
+
+class _ComponentMatcher:
+    """
+    Matches one component (the text between two dots) of a stat name.
+
+    `*` matches any text and `?` matches one character. `[lo-hi]` matches a
+    number between `lo` and `hi` (inclusive). `hi` can be `*` for no upper
+    bound, e.g., `cores[1-*]` matches `cores1`, `cores2`, ... but not
+    `cores0` or `cores`.
+    """
+
+    def __init__(self, pattern: str):
+        self._ranges = []
+        regex = []
+        position = 0
+        for match in _RANGE_PATTERN.finditer(pattern):
+            regex.append(self._translate(pattern[position : match.start()]))
+            regex.append(r"(\d+)")
+            low = int(match.group(1))
+            high = None if match.group(2) == "*" else int(match.group(2))
+            self._ranges.append((low, high))
+            position = match.end()
+        regex.append(self._translate(pattern[position:]))
+        self._regex = re.compile("".join(regex) + r"\Z")
+
+    @staticmethod
+    def _translate(text: str) -> str:
+        return "".join(
+            ".*" if c == "*" else "." if c == "?" else re.escape(c)
+            for c in text
+        )
+
+    def matches(self, component: str) -> bool:
+        match = self._regex.match(component)
+        if match is None:
+            return False
+        for (low, high), number in zip(self._ranges, match.groups()):
+            number = int(number)
+            if number < low or (high is not None and number > high):
+                return False
+        return True
+
+
+class _TrieNode:
+    __slots__ = ("children", "name", "value", "order")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.name: Optional[str] = None
+        self.value: Optional[float] = None
+        self.order = 0
+
+
+class StatTrie:
+    """
+    A trie of stat names split on ".".
+
+    `query` finds all of the stats that match a glob pattern. Each component
+    of the pattern is matched against one component of the names (see
+    `_ComponentMatcher`). A component that is only `**` matches any number of
+    components (including none). Components without wildcards are looked up
+    directly instead of being compared against every child.
+
+    E.g., `board.processor.cores[1-*].core.ipc` gives the IPC of every core
+    but the first one and `**.m_demand_hits` gives every `m_demand_hits` stat.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, float]]):
+        self._root = _TrieNode()
+        for order, (name, value) in enumerate(entries):
+            node = self._root
+            for component in name.split("."):
+                node = node.children.setdefault(component, _TrieNode())
+            node.name = name
+            node.value = value
+            node.order = order
+        self._matchers: Dict[str, _ComponentMatcher] = {}
+
+    def _matcher(self, component: str) -> _ComponentMatcher:
+        if not component in self._matchers:
+            self._matchers[component] = _ComponentMatcher(component)
+        return self._matchers[component]
+
+    def _match(self, node: _TrieNode, parts: List[str], i: int, found):
+        if i == len(parts):
+            if node.name is not None:
+                found[node.name] = node
+            return
+        part = parts[i]
+        if part == "**":
+            self._match(node, parts, i + 1, found)
+            for child in node.children.values():
+                self._match(child, parts, i, found)
+        elif not any(c in part for c in "*?["):
+            child = node.children.get(part)
+            if child is not None:
+                self._match(child, parts, i + 1, found)
+        else:
+            matcher = self._matcher(part)
+            for component, child in node.children.items():
+                if matcher.matches(component):
+                    self._match(child, parts, i + 1, found)
+
+    def query(
+        self, pattern: str, exclude: Iterable[str] = ()
+    ) -> List[Tuple[str, float]]:
+        """
+        :param pattern: Glob pattern of the stats to find.
+        :param exclude: Glob patterns of stats to leave out of the result.
+        :returns: `(name, value)` pairs in the order they are in the stats
+        file.
+        """
+        found: Dict[str, _TrieNode] = {}
+        self._match(self._root, pattern.split("."), 0, found)
+        for exclude_pattern in exclude:
+            excluded: Dict[str, _TrieNode] = {}
+            self._match(self._root, exclude_pattern.split("."), 0, excluded)
+            for name in excluded:
+                found.pop(name, None)
+        return [
+            (node.name, node.value)
+            for node in sorted(found.values(), key=lambda node: node.order)
+        ]
+
+
+class StatsIndex:
+    """
+    A name to value table built from a single pass over a stats file.
+
+    Only the first dump in the file is indexed. With the ROI exit event
+    handlers in `workloads/roi_manager.py` this is the dump for the region of
+    interest. Every line that has a numerical value is stored by its full
+    name. Glob queries (see `StatTrie`) go through a trie of the names that
+    is built the first time it is needed, and their results are cached.
+
+    Ruby histograms print all of their buckets on one line, as
+    `name | count percent cumulative | count percent cumulative ...`. The
+    bucket counts of these lines are stored separately (see
+    `get_oneline_buckets`).
+    """
+
+    def __init__(
+        self,
+        entries: List[Tuple[str, float]],
+        source: str = "",
+        oneline_buckets: Optional[Dict[str, List[float]]] = None,
+    ):
+        """
+        :param entries: List of `(name, value)` pairs in the order they appear
+        in the stats file.
+        :param source: Where the entries came from. Only used in error
+        messages.
+        :param oneline_buckets: The bucket counts of every stat printed on
+        one line.
+        """
+        self._source = source
+        self._entries = entries
+        self._oneline_buckets = oneline_buckets or {}
+        self._values: Dict[str, float] = dict(entries)
+        self._trie: Optional[StatTrie] = None
+        self._queries: Dict[Tuple, List[Tuple[str, float]]] = {}
+        self._groups: Optional[Dict[str, List[Tuple[str, float]]]] = None
+
+    @classmethod
+    def from_lines(cls, lines, source: str = ""):
+        entries = []
+        oneline_buckets = {}
+        in_dump = False
+        for line in lines:
+            if "Begin Simulation Statistics" in line:
+                in_dump = True
+                continue
+            if "End Simulation Statistics" in line:
+                break
+            if not in_dump:
+                continue
+            tokens = line.split()
+            if len(tokens) < 2:
+                continue
+            if tokens[1] == "|":
+                # Every bucket starts with a `|` followed by its count. The
+                # unit or description follows the last bucket.
+                fields = line.split("|")[1:]
+                oneline_buckets[tokens[0]] = [
+                    float(field.split()[0]) for field in fields
+                ]
+                continue
+            try:
+                value = float(tokens[1])
+            except ValueError:
+                continue
+            entries.append((tokens[0], value))
+        return cls(entries, source, oneline_buckets)
+
+    @classmethod
+    def from_path(cls, path):
+        """
+        Build (or reuse) the index for the stats file at `path`.
+
+        Indices are cached by the absolute path, size and modification time of
+        the file. Calling this function many times for the same stats file
+        only parses it once.
+        """
+        path = os.path.abspath(path)
+        info = os.stat(path)
+        return _load_index(path, info.st_size, info.st_mtime_ns)
+
+    @classmethod
+    def from_stat_file(cls, stat_file):
+        """
+        Build (or reuse) the index for an opened stats file.
+        """
+        if isinstance(stat_file, StatsIndex):
+            return stat_file
+        return cls.from_path(stat_file.name)
+
+    def get(self, name: str) -> float:
+        if not name in self._values:
+            raise ValueError(f"Could not find {name} in {self._source}")
+        return self._values[name]
+
+    def query(
+        self, pattern: str, exclude: Iterable[str] = ()
+    ) -> List[Tuple[str, float]]:
+        """
+        Find all of the stats that match a glob pattern. See `StatTrie.query`.
+        """
+        key = (pattern, tuple(exclude))
+        if not key in self._queries:
+            if self._trie is None:
+                self._trie = StatTrie(self._entries)
+            self._queries[key] = self._trie.query(pattern, key[1])
+        return self._queries[key]
+
+    def get_group(self, name: str) -> List[Tuple[str, float]]:
+        """
+        Return the `(subname, value)` pairs of a vector, distribution or
+        histogram stat, i.e., every `name::subname` line in the file.
+        """
+        if self._groups is None:
+            self._groups = {}
+            for entry_name, value in self._entries:
+                if "::" in entry_name:
+                    base, subname = entry_name.split("::", 1)
+                    self._groups.setdefault(base, []).append((subname, value))
+        if not name in self._groups:
+            raise ValueError(f"Could not find {name} in {self._source}")
+        return self._groups[name]
+
+    def get_oneline_buckets(self, name: str) -> Optional[List[float]]:
+        """
+        The bucket counts of a stat printed on one line, or None if the stat
+        was not printed on one line.
+        """
+        return self._oneline_buckets.get(name)
+
+    def get_source(self) -> str:
+        return self._source
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._values
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+@lru_cache(maxsize=64)
+def _load_index(path: str, size: int, mtime_ns: int) -> StatsIndex:
+    # `size` and `mtime_ns` are only part of the cache key. They make sure a
+    # stats file that has been rewritten is parsed again.
+    with open(path, "r") as stat_file:
+        return StatsIndex.from_lines(stat_file, path)
+
+
+class Vector:
+    """
+    The value of a vector stat: one value per element and the total.
+    """
+
+    def __init__(
+        self,
+        subnames: List[str],
+        values: np.ndarray,
+        total: Optional[float] = None,
+    ):
+        self.subnames = subnames
+        self.values = values
+        self.total = total if total is not None else float(values.sum())
+
+    def __getitem__(self, subname: str) -> float:
+        return float(self.values[self.subnames.index(subname)])
+
+    def __repr__(self):
+        return f"Vector({dict(zip(self.subnames, self.values.tolist()))})"
+
+
+class Distribution:
+    """
+    The value of a distribution or histogram stat.
+
+    `counts[i]` is the number of samples in `[edges[i], edges[i + 1])`.
+    Samples below the first bucket and above the last bucket are only counted
+    in `underflows` and `overflows`.
+    """
+
+    def __init__(
+        self, edges: np.ndarray, counts: np.ndarray, summary: Dict[str, float]
+    ):
+        self.edges = edges
+        self.counts = counts
+        self.samples = summary.get("samples", float(counts.sum()))
+        self.mean = summary.get("mean")
+        self.gmean = summary.get("gmean")
+        self.stdev = summary.get("stdev")
+        self.underflows = summary.get("underflows", 0.0)
+        self.overflows = summary.get("overflows", 0.0)
+        self.min_value = summary.get("min_value")
+        self.max_value = summary.get("max_value")
+        self.total = summary.get("total")
+
+    def percentile(self, q):
+        """
+        Estimate the `q`-th percentile(s) (0 to 100) from the buckets,
+        assuming samples are spread evenly inside each bucket. `q` can be a
+        number or an array of numbers.
+        """
+        cumulative = np.concatenate(([0.0], np.cumsum(self.counts)))
+        if cumulative[-1] == 0:
+            raise ValueError("The distribution has no samples.")
+        targets = np.asarray(q, dtype=np.float64) / 100.0 * cumulative[-1]
+        return np.interp(targets, cumulative, self.edges)
+
+    def bucket_centers(self) -> np.ndarray:
+        return (self.edges[:-1] + self.edges[1:]) / 2
+
+    def __repr__(self):
+        return (
+            f"Distribution(samples={self.samples}, mean={self.mean}, "
+            f"buckets={len(self.counts)})"
+        )
 
 
 class Stat:
@@ -33,10 +403,21 @@ class Stat:
         self._name = name
         self._value = None
 
-    @abstractmethod
     def set_value_from_stat_file(self, stat_file):
+        """
+        :param stat_file: Opened stats file or a `StatsIndex` built from one.
+        """
+        self.set_value_from_stats_index(
+            StatsIndex.from_stat_file(stat_file)
+        )
+
+    @abstractmethod
+    def set_value_from_stats_index(self, stats_index: StatsIndex):
         raise NotImplementedError
 
+    def get_name(self) -> str:
+        return self._name
+
     def set_value(self, value: Any):
         if not self._value is None:
             raise ValueError("_value is already set.")
@@ -60,37 +441,126 @@ class RootStat(Stat):
     def __init__(self, name: str):
         super().__init__(name)
 
-    def set_value_from_stat_file(self, stat_file):
-        ret = 0
-        instances = 0
-        stat_file.seek(0)
-        for line in stat_file.readlines()[2:10]:
-            stat_in_line = line.split()[0]
-            if self._name == stat_in_line:
-                ret = float(line.split()[1])
-                instances += 1
-        if instances == 0:
+    def set_value_from_stats_index(self, stats_index: StatsIndex):
+        self._value = stats_index.get(self._name)
+
+
+class GlobStat(Stat):
+    """
+    The sum of all of the stats that match a glob pattern (see `StatTrie`),
+    e.g., `board.processor.cores[1-*].core.numCycles`.
+    """
+
+    def __init__(self, pattern: str, exclude: Iterable[str] = ()):
+        """
+        :param pattern: Glob pattern of the stats to sum.
+        :param exclude: Glob patterns of stats to leave out.
+        """
+        super().__init__(pattern)
+        self._pattern = pattern
+        self._exclude = tuple(exclude)
+
+    def set_value_from_stats_index(self, stats_index: StatsIndex):
+        matches = stats_index.query(self._pattern, self._exclude)
+        if not matches:
             raise ValueError(
-                f"Could not find {self._name} in {stat_file.name}"
+                f"Could not find {self._name} in {stats_index.get_source()}"
             )
-        self._value = ret
+        self._value = sum(value for _, value in matches)
 
 
-class AggregateStat(Stat):
+class AggregateStat(GlobStat):
+    """
+    The sum of every stat whose last name component is `name`, e.g.,
+    `m_demand_hits` sums the hits of all of the caches.
+
+    The stats of the extra core and its L1 controller (`DEFAULT_EXCLUDES`)
+    are left out.
+    """
+
+    def __init__(self, name: str, exclude: Iterable[str] = DEFAULT_EXCLUDES):
+        super().__init__(f"**.{name}", exclude)
+        self._name = name
+
+
+class VectorStat(Stat):
+    """
+    A vector stat, e.g., `board.cache_hierarchy.ruby_system.network.msg_count`
+    lines like `...::Control` and `...::Data`.
+    """
+
     def __init__(self, name: str):
         super().__init__(name)
 
-    def set_value_from_stat_file(self, stat_file):
-        ret = 0
-        instances = 0
-        stat_file.seek(0)
-        for line in stat_file.readlines()[10:-3]:
-            stat_in_line = line.split()[0].split(".")[-1]
-            if self._name == stat_in_line:
-                ret += float(line.split()[1])
-                instances += 1
-        if instances == 0:
-            raise ValueError(
-                f"Could not find {self._name} in {stat_file.name}"
-            )
-        self._value = ret
+    def set_value_from_stats_index(self, stats_index: StatsIndex):
+        subnames = []
+        values = []
+        total = None
+        for subname, value in stats_index.get_group(self._name):
+            if subname == "total":
+                total = value
+            else:
+                subnames.append(subname)
+                values.append(value)
+        self._value = Vector(subnames, np.array(values), total)
+
+
+class DistributionStat(Stat):
+    """
+    A distribution stat with `::samples`, `::mean`, ... lines followed by one
+    line per bucket named after the bucket's range (e.g., `::0-31`) or value
+    (e.g., `::4`).
+
+    Stats printed on one line (the Ruby histograms) have `::bucket_size`
+    and `::max_bucket` lines instead, and their buckets start at 0.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+
+    def set_value_from_stats_index(self, stats_index: StatsIndex):
+        summary = {}
+        lows = []
+        highs = []
+        counts = []
+        bucket_size = None
+        for subname, value in stats_index.get_group(self._name):
+            if subname in _DISTRIBUTION_SUMMARY:
+                summary[subname] = value
+                continue
+            if subname == "bucket_size":
+                bucket_size = value
+                continue
+            match = _BUCKET_PATTERN.match(subname)
+            if match is None:
+                continue
+            low = float(match.group(1))
+            high = float(match.group(2)) if match.group(2) else low
+            lows.append(low)
+            highs.append(high)
+            counts.append(value)
+
+        oneline = stats_index.get_oneline_buckets(self._name)
+        if not counts and oneline is not None and bucket_size is not None:
+            edges = np.arange(len(oneline) + 1) * bucket_size
+            self._value = Distribution(edges, np.array(oneline), summary)
+            return
+        if not counts:
+            raise ValueError(f"{self._name} has no buckets.")
+        # Bucket names give the first and last value in the bucket. Buckets
+        # are contiguous, so each one ends where the next one starts.
+        if len(lows) > 1:
+            width = lows[1] - lows[0]
+        else:
+            width = highs[0] - lows[0] + 1
+        edges = np.array(lows + [lows[-1] + width])
+        self._value = Distribution(edges, np.array(counts), summary)
+
+
+class HistogramStat(DistributionStat):
+    """
+    A histogram stat, e.g., the Ruby latency histograms such as
+    `board.cache_hierarchy.ruby_system.m_missLatencyHistSeqr`. Histograms
+    have a `::gmean` line and no underflow and overflow lines. The Ruby
+    histograms print their buckets on one line.
+    """
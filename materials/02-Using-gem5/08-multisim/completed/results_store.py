@@ -0,0 +1,433 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+This script collects the results of many gem5 runs (e.g., the output of
+my-cores-run.py or a design space exploration sweep) into one SQLite database.
+
+Every directory under the given paths that has a `stats.txt` file is a run.
+For each run we store its configuration (processor, cache hierarchy, memory
+and workload) and a selected set of stats.
+
+The configuration comes from the name of the run directory. multisim names
+the output directory of each simulation after its id, and my-cores-run.py
+uses `f"{processor_type.get_name()}-{benchmark.get_id()}"` as the id. The
+default `--id-pattern` splits that into the processor and the workload.
+Anything the pattern does not give is filled in from the `config.json` file
+of the run.
+
+$ python3 results_store.py ingest results.db m5out
+
+Then, comparing the IPC of the big and little cores is one query.
+
+$ python3 results_store.py query results.db "SELECT processor, workload, value FROM runs JOIN stats ON stats.run_id = runs.id WHERE stats.name = 'board.processor.cores.core.ipc' ORDER BY workload, processor"
+
+Running the same command again only parses the stats files that changed.
+The database keeps a manifest with the size, modification time and SHA-256
+hash of every stats file it has ingested. A stats file is skipped if its size
+and modification time are unchanged, or if they changed but its hash did
+not (e.g., it was copied). Use `--force` to parse everything again.
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_ID_PATTERN = r"(?P<processor>[^-]+)-(?P<workload>.+)"
+
+DEFAULT_STATS = [
+    "simSeconds",
+    "simTicks",
+    "simInsts",
+    "simOps",
+    "hostSeconds",
+    "board.processor.*.core.ipc",
+    "board.processor.*.core.cpi",
+    "board.processor.*.core.numCycles",
+    "board.cache_hierarchy.*.overallHits::total",
+    "board.cache_hierarchy.*.overallMisses::total",
+    "board.cache_hierarchy.*.overallMissRate::total",
+    "board.memory.*.readBursts",
+    "board.memory.*.writeBursts",
+]
+
+CONFIG_FIELDS = ["processor", "cache_hierarchy", "memory", "workload"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    processor TEXT,
+    cache_hierarchy TEXT,
+    memory TEXT,
+    workload TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_config
+    ON runs (processor, cache_hierarchy, memory, workload);
+CREATE INDEX IF NOT EXISTS runs_workload ON runs (workload);
+CREATE TABLE IF NOT EXISTS stats (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS stats_name ON stats (name, run_id);
+CREATE TABLE IF NOT EXISTS manifest (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    settings TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def open_store(db_path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def find_runs(paths: Iterable[str]) -> List[Path]:
+    """
+    Find all of the directories with a stats.txt file under `paths`.
+    """
+    runs = set()
+    for path in paths:
+        for stats_file in Path(path).rglob("stats.txt"):
+            runs.add(stats_file.parent.resolve())
+    return sorted(runs)
+
+
+def read_stats(
+    stats_file: Path, patterns: List[str], dump: int = 0
+) -> Dict[str, float]:
+    """
+    Read the stats that match any of the glob `patterns` from one dump of a
+    stats file. `dump` is the index of the dump (-1 for the last one).
+
+    A stats file without any dump (e.g., of a run that just started) has no
+    stats. Raises an IndexError if the file has dumps but not `dump`.
+    """
+    dumps = []
+    current = None
+    with open(stats_file, "r") as f:
+        for line in f:
+            if "Begin Simulation Statistics" in line:
+                current = {}
+                continue
+            if "End Simulation Statistics" in line:
+                dumps.append(current)
+                current = None
+                # Only keep the dumps that are needed.
+                if dump >= 0 and len(dumps) > dump:
+                    break
+                if dump < 0:
+                    dumps = dumps[dump:]
+                continue
+            if current is None:
+                continue
+            tokens = line.split(None, 2)
+            if len(tokens) < 2:
+                continue
+            if not any(fnmatchcase(tokens[0], p) for p in patterns):
+                continue
+            try:
+                current[tokens[0]] = float(tokens[1])
+            except ValueError:
+                continue
+    if not dumps:
+        return {}
+    if dump >= len(dumps) or -dump > len(dumps):
+        raise IndexError(
+            f"{stats_file} has {len(dumps)} dumps, there is no dump {dump}."
+        )
+    return dumps[dump]
+
+
+def _memory_size(range_value: str) -> int:
+    start, end = range_value.split(":")
+    return int(end) - int(start)
+
+
+def read_config(run_dir: Path) -> Dict[str, str]:
+    """
+    Describe the cache hierarchy and memory of a run from its config.json.
+
+    gem5 only records the C++ type of each SimObject (e.g., `SubSystem` for
+    all standard library components) so we describe the components by their
+    parameters instead: the size of every cache level and the number of
+    memory channels with the total memory size.
+    """
+    config_file = run_dir / "config.json"
+    if not config_file.is_file():
+        return {}
+    with open(config_file, "r") as f:
+        config = json.load(f)
+
+    caches = {}
+    num_channels = 0
+    memory_size = 0
+    objects = [config]
+    while objects:
+        obj = objects.pop()
+        if isinstance(obj, list):
+            objects.extend(obj)
+            continue
+        if not isinstance(obj, dict):
+            continue
+        obj_type = obj.get("type")
+        if obj_type == "Cache":
+            # l1dcaches0 and l1dcaches1 are both l1dcaches
+            level = re.sub(r"\d+$", "", str(obj.get("name", "cache")))
+            caches[level] = obj.get("size")
+        elif obj_type in ("DRAMInterface", "NVMInterface", "SimpleMemory"):
+            num_channels += 1
+            if "range" in obj:
+                memory_size += _memory_size(obj["range"])
+        objects.extend(obj.values())
+
+    config_fields = {}
+    if caches:
+        config_fields["cache_hierarchy"] = ",".join(
+            f"{level}={size}" for level, size in sorted(caches.items())
+        )
+    if num_channels:
+        config_fields["memory"] = f"{num_channels}ch-{memory_size}B"
+    return config_fields
+
+
+def describe_run(run_dir: Path, id_pattern: re.Pattern) -> Dict[str, str]:
+    config_fields = read_config(run_dir)
+    match = id_pattern.fullmatch(run_dir.name)
+    if match:
+        for field, value in match.groupdict().items():
+            if field in CONFIG_FIELDS and value is not None:
+                config_fields[field] = value
+    return config_fields
+
+
+def file_hash(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def needs_ingest(
+    connection: sqlite3.Connection,
+    stats_file: Path,
+    settings: str,
+    force: bool = False,
+) -> Optional[Dict]:
+    """
+    Check the manifest to see if a stats file has to be parsed again.
+
+    :param settings: What is read from the stats file (patterns, dump, etc.).
+    A stats file ingested with different settings is always parsed again.
+    :param force: Parse the stats file again even if it has not changed.
+
+    :returns: None if the stats file is up to date in the database.
+    Otherwise, the new manifest entry for the stats file.
+    """
+    info = stats_file.stat()
+    entry = {
+        "path": str(stats_file),
+        "size": info.st_size,
+        "mtime_ns": info.st_mtime_ns,
+        "settings": settings,
+    }
+    if force:
+        entry["sha256"] = file_hash(stats_file)
+        return entry
+    row = connection.execute(
+        "SELECT size, mtime_ns, sha256, settings FROM manifest WHERE path = ?",
+        (entry["path"],),
+    ).fetchone()
+    if row is not None and row[3] == settings:
+        if row[0] == entry["size"] and row[1] == entry["mtime_ns"]:
+            return None
+    entry["sha256"] = file_hash(stats_file)
+    if row is not None and row[3] == settings and row[2] == entry["sha256"]:
+        # Same content with a new modification time. Only the manifest needs
+        # to be updated.
+        update_manifest(connection, entry)
+        return None
+    return entry
+
+
+def update_manifest(connection: sqlite3.Connection, entry: Dict) -> None:
+    connection.execute(
+        "INSERT OR REPLACE INTO manifest (path, size, mtime_ns, sha256, "
+        "settings) VALUES (:path, :size, :mtime_ns, :sha256, :settings)",
+        entry,
+    )
+
+
+def ingest_run(
+    connection: sqlite3.Connection,
+    run_dir: Path,
+    config_fields: Dict[str, str],
+    stats: Dict[str, float],
+) -> None:
+    connection.execute("DELETE FROM runs WHERE path = ?", (str(run_dir),))
+    cursor = connection.execute(
+        "INSERT INTO runs (path, name, processor, cache_hierarchy, memory, "
+        "workload) VALUES (?, ?, ?, ?, ?, ?)",
+        [str(run_dir), run_dir.name]
+        + [config_fields.get(field) for field in CONFIG_FIELDS],
+    )
+    connection.executemany(
+        "INSERT INTO stats (run_id, name, value) VALUES (?, ?, ?)",
+        [(cursor.lastrowid, name, value) for name, value in stats.items()],
+    )
+
+
+def ingest(
+    db_path: str,
+    paths: Iterable[str],
+    patterns: Optional[List[str]] = None,
+    id_pattern: str = DEFAULT_ID_PATTERN,
+    dump: int = 0,
+    force: bool = False,
+) -> Tuple[int, int]:
+    """
+    Ingest every new or changed run under `paths` into the database at
+    `db_path`.
+
+    Runs that are already in the database are replaced. Runs whose stats
+    file has not changed since it was ingested with the same settings are
+    skipped unless `force` is True.
+
+    :returns: The number of runs ingested and the number of runs skipped.
+    """
+    patterns = patterns or DEFAULT_STATS
+    compiled_id_pattern = re.compile(id_pattern)
+    # Changing what is stored has to re-parse every stats file.
+    settings = json.dumps([patterns, id_pattern, dump])
+    connection = open_store(db_path)
+    num_ingested = 0
+    num_skipped = 0
+    for run_dir in find_runs(paths):
+        stats_file = run_dir / "stats.txt"
+        with connection:
+            entry = needs_ingest(connection, stats_file, settings, force)
+            if entry is None:
+                num_skipped += 1
+                continue
+            stats = read_stats(stats_file, patterns, dump)
+            config_fields = describe_run(run_dir, compiled_id_pattern)
+            ingest_run(connection, run_dir, config_fields, stats)
+            update_manifest(connection, entry)
+            num_ingested += 1
+    connection.close()
+    return num_ingested, num_skipped
+
+
+def query(db_path: str, sql: str) -> None:
+    connection = open_store(db_path)
+    cursor = connection.execute(sql)
+    if cursor.description:
+        print("\t".join(column[0] for column in cursor.description))
+    for row in cursor:
+        print("\t".join(str(value) for value in row))
+    connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Collect the results of gem5 runs into SQLite."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser(
+        "ingest", help="Add or update runs in the database."
+    )
+    ingest_parser.add_argument("db", type=str)
+    ingest_parser.add_argument(
+        "paths",
+        type=str,
+        nargs="+",
+        help="Directories to search for runs (e.g., m5out).",
+    )
+    ingest_parser.add_argument(
+        "--stat",
+        type=str,
+        action="append",
+        default=None,
+        help="Stat name or glob pattern to store. Can be given many times.",
+    )
+    ingest_parser.add_argument(
+        "--id-pattern",
+        type=str,
+        default=DEFAULT_ID_PATTERN,
+        help="Regular expression with named groups (processor, "
+        "cache_hierarchy, memory, workload) matched against the name of "
+        "each run directory.",
+    )
+    ingest_parser.add_argument(
+        "--dump",
+        type=int,
+        default=0,
+        help="Which dump of stats.txt to store (-1 for the last one).",
+    )
+    ingest_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Parse every stats file even if it has not changed.",
+    )
+
+    query_parser = subparsers.add_parser(
+        "query", help="Run an SQL query on the database."
+    )
+    query_parser.add_argument("db", type=str)
+    query_parser.add_argument("sql", type=str)
+
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        num_ingested, num_skipped = ingest(
+            args.db,
+            args.paths,
+            args.stat,
+            args.id_pattern,
+            args.dump,
+            args.force,
+        )
+        print(
+            f"Ingested {num_ingested} runs into {args.db} "
+            f"({num_skipped} unchanged runs skipped)"
+        )
+    else:
+        query(args.db, args.sql)
@@ -1,40 +1,64 @@
-baseline_ipc = 0.0
-baseline_stats_file = "/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/complete/full-detailed-run-m5out/stats.txt"
+import argparse
+from pathlib import Path
+import sys
 
-with open(baseline_stats_file, "r") as f:
-    for line in f:
-        if "board.processor.cores.core.ipc" in line:
-            line = line.split()
-            baseline_ipc = float(line[1])
-            break
+# The shared helpers live in 09-sampling/util
+sys.path.append(Path(__file__).resolve().parents[2].as_posix())
+from util.simpoint_predictor import predict
+from util.stats_reader import iter_stat_dumps
 
-num_simpoints = 3
-simpoint_ipcs = []
-simpoint_weights = []
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--simpoint-dir",
+    type=str,
+    default="/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/complete",
+    help="Directory with results.simpts, results.weights, the "
+    "simpoint[sid]-run directories and full-detailed-run-m5out",
+)
+parser.add_argument(
+    "--stat",
+    type=str,
+    action="append",
+    default=None,
+    help="Stat to predict. Can be given many times. "
+    "Defaults to board.processor.cores.core.ipc",
+)
+parser.add_argument(
+    "--jobs",
+    type=int,
+    default=None,
+    help="Number of stats files to parse in parallel",
+)
+parser.add_argument(
+    "--runs-dir",
+    type=str,
+    default=None,
+    help="Directory with the simpoint[sid]-run directories if they are not "
+    "in --simpoint-dir, e.g. "
+    "simpoint-checkpoint/runs-results-I1000000 from run-all-simpoint.py",
+)
+args = parser.parse_args()
 
-for i in range(num_simpoints):
-    simpoint_stats_file = f"/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/complete/simpoint{i}-run/stats.txt"
-    with open(simpoint_stats_file, "r") as f:
-        simpoint_ipc = 0.0
-        for line in f:
-            if "board.processor.cores.core.ipc" in line:
-                line = line.split()
-                simpoint_ipc = float(line[1])
-        simpoint_ipcs.append(simpoint_ipc)
-    simpoint_stdout_file = f"/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/complete/simpoint{i}-run/simout.txt"
-    simpoint_weight = 0.0
-    with open(simpoint_stdout_file, "r") as f:
-        for line in f:
-            if "Ran SimPoint" in line:
-                line = line.split()
-                simpoint_weight = float(line[-1])
-    simpoint_weights.append(simpoint_weight)
+simpoint_dir = Path(args.simpoint_dir)
+stat_names = args.stat or ["board.processor.cores.core.ipc"]
 
-predicted_ipc = 0.0
+predictions = predict(
+    Path(args.runs_dir) if args.runs_dir else simpoint_dir,
+    simpoint_dir / "results.simpts",
+    simpoint_dir / "results.weights",
+    stat_names,
+    max_workers=args.jobs,
+)
 
-for i in range(num_simpoints):
-    predicted_ipc += simpoint_ipcs[i] * simpoint_weights[i]
+baseline_stats_file = simpoint_dir / "full-detailed-run-m5out" / "stats.txt"
+baseline = {}
+if baseline_stats_file.is_file():
+    baseline = next(iter_stat_dumps(baseline_stats_file, stat_names), {})
 
-print(f"predicted IPC: {predicted_ipc}")
-print(f"actual IPC: {baseline_ipc}")
-print(f"relative error: {(abs(baseline_ipc - predicted_ipc)/baseline_ipc)*100}%")
+for stat_name, predicted in predictions.items():
+    print(f"{stat_name}")
+    print(f"predicted: {predicted}")
+    if stat_name in baseline:
+        actual = baseline[stat_name]
+        print(f"actual: {actual}")
+        print(f"relative error: {(abs(actual - predicted)/actual)*100}%")
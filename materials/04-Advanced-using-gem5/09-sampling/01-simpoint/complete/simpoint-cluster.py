@@ -0,0 +1,135 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Find SimPoints in the BBV file of simpoint-analysis.py without the SimPoint
+binary (see util/simpoint_cluster.py).
+
+This replaces simpoint3.2-cmd.sh. Instead of a fixed k, every k up to
+`--max-k` is tried in parallel and k is picked with the BIC, like the
+SimPoint tool does with `-maxK`.
+
+Usage
+-----
+
+python3 simpoint-cluster.py
+python3 simpoint-cluster.py --k=5
+
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# The shared helpers live in 09-sampling/util
+sys.path.append(Path(__file__).resolve().parents[2].as_posix())
+from util.simpoint_cluster import (
+    BIC_THRESHOLD,
+    KMEANS_SEED,
+    PROJECTED_DIMENSIONS,
+    PROJECTION_SEED,
+    cluster,
+    normalize,
+    pick_simpoints,
+    random_projection,
+    read_bbv,
+    write_simpoints,
+)
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--bbv-file",
+    type=str,
+    default="simpoint-analysis-m5out/simpoint.bb.gz",
+    help="The BBV file written by simpoint-analysis.py",
+)
+parser.add_argument(
+    "--max-k",
+    type=int,
+    default=10,
+    help="Largest number of clusters to try",
+)
+parser.add_argument(
+    "--k",
+    type=int,
+    default=None,
+    help="Use exactly this number of clusters instead of searching",
+)
+parser.add_argument(
+    "--dimensions",
+    type=int,
+    default=PROJECTED_DIMENSIONS,
+    help="Number of dimensions to project the BBVs to",
+)
+parser.add_argument(
+    "--num-init",
+    type=int,
+    default=5,
+    help="Number of k-means runs with different initial centers per k",
+)
+parser.add_argument(
+    "--bic-threshold",
+    type=float,
+    default=BIC_THRESHOLD,
+    help="Pick the smallest k with a BIC score this far between the "
+    "worst and the best score",
+)
+parser.add_argument("--projection-seed", type=int, default=PROJECTION_SEED)
+parser.add_argument("--kmeans-seed", type=int, default=KMEANS_SEED)
+parser.add_argument(
+    "--jobs",
+    type=int,
+    default=None,
+    help="Number of processes (default: number of host cores)",
+)
+parser.add_argument("--simpoints-file", type=str, default="results.simpts")
+parser.add_argument("--weights-file", type=str, default="results.weights")
+args = parser.parse_args()
+
+bbv = read_bbv(args.bbv_file)
+num_intervals, num_blocks = bbv.get_shape()
+print(f"Read {num_intervals} intervals with {num_blocks} basic blocks")
+points = random_projection(
+    normalize(bbv), args.dimensions, args.projection_seed
+)
+
+k, labels, scores = cluster(
+    points,
+    max_k=args.k or args.max_k,
+    min_k=args.k or 1,
+    num_init=args.num_init,
+    seed=args.kmeans_seed,
+    threshold=args.bic_threshold,
+    max_workers=args.jobs,
+)
+for score_k, score in sorted(scores.items()):
+    print(f"k = {score_k}: BIC = {score}")
+print(f"Picked k = {k}")
+
+simpoints = pick_simpoints(points, labels)
+write_simpoints(simpoints, args.simpoints_file, args.weights_file)
+for interval, label, weight in simpoints:
+    print(f"SimPoint at interval {interval} with weight {weight:g}")
@@ -0,0 +1,172 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Pick the SimPoint interval size from a single profiling run.
+
+simpoint-analysis.py profiles the program with a fixed interval size
+(1,000,000 instructions). This script merges the BBVs of consecutive
+intervals into coarser ones (e.g., 2x, 5x and 10x the interval size),
+finds SimPoints for every interval size and reports
+- the number of SimPoints,
+- how far the weighted SimPoints are from the whole program in basic block
+space (see `simpoint_bbv_error` in util/simpoint_cluster.py), and
+- the number of instructions that have to be simulated in detail, which is
+the number of SimPoints times the interval size plus the warmup.
+
+The recommended interval size is the cheapest one with a BBV error of at
+most `--max-error`. Its SimPoints are written to `--simpoints-file` and
+`--weights-file` (granularity.simpts and granularity.weights by default, so
+the results.simpts of simpoint-cluster.py is left alone). To use them, pass
+the files and the interval size it prints to run-all-simpoint.py:
+
+python3 run-all-simpoint.py --simpoints-file=granularity.simpts \
+    --weights-file=granularity.weights --interval=[size] \
+    --checkpoint-dir=simpoint-checkpoint-[size]
+
+Usage
+-----
+
+python3 simpoint-granularity.py --factor=1 --factor=2 --factor=5 --factor=10
+
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# The shared helpers live in 09-sampling/util
+sys.path.append(Path(__file__).resolve().parents[2].as_posix())
+from util.bbv import coarsen, read_bbv
+from util.simpoint_cluster import (
+    cluster,
+    normalize,
+    pick_simpoints,
+    random_projection,
+    simpoint_bbv_error,
+    write_simpoints,
+)
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--bbv-file",
+    type=str,
+    default="simpoint-analysis-m5out/simpoint.bb.gz",
+    help="The BBV file written by simpoint-analysis.py",
+)
+parser.add_argument(
+    "--interval-size",
+    type=int,
+    default=1_000_000,
+    help="The interval size the BBV file was profiled with",
+)
+parser.add_argument(
+    "--factor",
+    type=int,
+    action="append",
+    default=None,
+    help="Multiple of the profiled interval size to evaluate. Can be given "
+    "many times (default: 1, 2, 5 and 10).",
+)
+parser.add_argument(
+    "--warmup",
+    type=int,
+    default=1_000_000,
+    help="Instructions of detailed warmup before every SimPoint",
+)
+parser.add_argument(
+    "--max-k",
+    type=int,
+    default=10,
+    help="Largest number of clusters to try",
+)
+parser.add_argument(
+    "--max-error",
+    type=float,
+    default=0.1,
+    help="Largest acceptable BBV error of the recommended interval size",
+)
+parser.add_argument(
+    "--jobs",
+    type=int,
+    default=None,
+    help="Number of processes (default: number of host cores)",
+)
+parser.add_argument("--simpoints-file", type=str, default="granularity.simpts")
+parser.add_argument("--weights-file", type=str, default="granularity.weights")
+args = parser.parse_args()
+
+bbv = read_bbv(args.bbv_file)
+
+results = []
+for factor in sorted(set(args.factor or [1, 2, 5, 10])):
+    coarse = coarsen(bbv, factor)
+    points = random_projection(normalize(coarse))
+    k, labels, _ = cluster(points, max_k=args.max_k, max_workers=args.jobs)
+    simpoints = pick_simpoints(points, labels)
+    interval_size = factor * args.interval_size
+    results.append(
+        {
+            "factor": factor,
+            "interval_size": interval_size,
+            "num_intervals": coarse.get_shape()[0],
+            "simpoints": simpoints,
+            "error": simpoint_bbv_error(coarse, simpoints),
+            "detailed_instructions": len(simpoints)
+            * (interval_size + args.warmup),
+        }
+    )
+
+print(
+    f"{'interval size':>14} {'intervals':>10} {'SimPoints':>10} "
+    f"{'BBV error':>10} {'detailed insts':>15}"
+)
+for result in results:
+    print(
+        f"{result['interval_size']:>14} {result['num_intervals']:>10} "
+        f"{len(result['simpoints']):>10} {result['error']:>10.4f} "
+        f"{result['detailed_instructions']:>15}"
+    )
+
+acceptable = [
+    result for result in results if result["error"] <= args.max_error
+]
+if acceptable:
+    best = min(acceptable, key=lambda result: result["detailed_instructions"])
+else:
+    print(f"No interval size has a BBV error of at most {args.max_error}")
+    best = min(results, key=lambda result: result["error"])
+
+write_simpoints(best["simpoints"], args.simpoints_file, args.weights_file)
+print(
+    f"Recommended interval size: {best['interval_size']} "
+    f"({best['factor']}x, {len(best['simpoints'])} SimPoints, "
+    f"BBV error {best['error']:.4f})"
+)
+print(
+    f"Wrote its SimPoints to {args.simpoints_file} and {args.weights_file}. "
+    f"Use them with --interval={best['interval_size']}."
+)
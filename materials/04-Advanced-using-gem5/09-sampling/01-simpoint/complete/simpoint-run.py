@@ -30,9 +30,13 @@ Usage
 
 gem5 -re --outdir=simpoint[sid]-run simpoint-run.py --sid=[sid]
 
+With `--store`, a checkpoint that is not in `--checkpoint-dir` is first
+written back from the checkpoint store (see util/checkpoint_store.py).
+
 """
 
 import argparse
+import sys
 from pathlib import Path
 
 from gem5.components.boards.simple_board import SimpleBoard
@@ -50,14 +54,65 @@ from gem5.resources.resource import BinaryResource
 from gem5.utils.requires import requires
 import m5
 
+# The shared helpers live in 09-sampling/util
+sys.path.append(Path(__file__).resolve().parents[2].as_posix())
+from util.checkpoint_store import CheckpointStore
+
 requires(isa_required=ISA.X86)
 
 parser = argparse.ArgumentParser()
 
 parser.add_argument("--sid", type=int, required=True)
+parser.add_argument(
+    "--binary",
+    type=str,
+    default="/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/workload/simple_workload",
+    help="The binary to simulate",
+)
+parser.add_argument(
+    "--simpoints-file",
+    type=str,
+    default="/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/results.simpts",
+)
+parser.add_argument(
+    "--interval",
+    type=int,
+    default=1_000_000,
+    help="The SimPoint interval size the SimPoints were found with",
+)
+parser.add_argument(
+    "--weights-file",
+    type=str,
+    default="/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/results.weights",
+)
+parser.add_argument(
+    "--checkpoint-dir",
+    type=str,
+    default="simpoint-checkpoint",
+    help="Directory with the SimPoint checkpoints of simpoint-checkpoint.py",
+)
+parser.add_argument(
+    "--store",
+    type=str,
+    default=None,
+    help="Checkpoint store to restore the checkpoint from if it is not in "
+    "--checkpoint-dir",
+)
 
 args = parser.parse_args()
 
+# Restoring the checkpoint starts the run at the beginning of the warmup of
+# the SimPoint instead of fast-forwarding from the start of the program.
+checkpoint = Path(args.checkpoint_dir) / f"cpt.SimPoint{args.sid}"
+if args.store and not checkpoint.is_dir():
+    with CheckpointStore(args.store) as store:
+        store.restore(checkpoint.name, checkpoint)
+if not checkpoint.is_dir():
+    raise FileNotFoundError(
+        f"Could not find the checkpoint {checkpoint}. "
+        "Run simpoint-checkpoint.py first."
+    )
+
 cache_hierarchy = PrivateL1PrivateL2WalkCacheHierarchy(
     l1d_size="32kB",
     l1i_size="32kB",
@@ -80,16 +135,16 @@ board = SimpleBoard(
 )
 
 simpoint_info = SimPoint(
-    simpoint_interval=1_000_000,
-    simpoint_file_path=Path("/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/results.simpts"),
-    weight_file_path=Path("/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/results.weights"),
+    simpoint_interval=args.interval,
+    simpoint_file_path=Path(args.simpoints_file),
+    weight_file_path=Path(args.weights_file),
     warmup_interval=1_000_000
 )
 
 board.set_se_simpoint_workload(
-    binary=BinaryResource(local_path=Path("/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/workload/simple_workload").as_posix()),
+    binary=BinaryResource(local_path=args.binary),
     simpoint=simpoint_info,
-    checkpoint=Path(f"simpoint-checkpoint/cpt.SimPoint{args.sid}")
+    checkpoint=checkpoint
 )
 
 def max_inst():
@@ -49,6 +49,15 @@ from gem5.utils.requires import requires
 
 requires(isa_required=ISA.X86)
 
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--binary",
+    type=str,
+    default="/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/workload/simple_workload",
+    help="The binary to simulate",
+)
+args = parser.parse_args()
+
 cache_hierarchy = PrivateL1PrivateL2WalkCacheHierarchy(
     l1d_size="32kB",
     l1i_size="32kB",
@@ -71,7 +80,7 @@ board = SimpleBoard(
 )
 
 board.set_se_binary_workload(
-    binary=BinaryResource(local_path=Path("/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/workload/simple_workload").as_posix())
+    binary=BinaryResource(local_path=args.binary)
 )
 
 simulator = Simulator(
@@ -0,0 +1,298 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Run every SimPoint with simpoint-run.py and predict the whole-program stats.
+
+This replaces run-all-simpoint.sh, which started exactly three gem5
+processes. It reads the SimPoints from results.simpts and runs
+`simpoint-run.py --sid=N` for every one of them with at most `--jobs` gem5
+processes at a time. By default the limit is the number of host cores or the
+number of processes that fit in the available memory with `--mem-per-job`
+each, whichever is smaller.
+
+Every run restores the checkpoint of its SimPoint from `--checkpoint-dir`
+instead of fast-forwarding from the start of the program. If the
+checkpoints do not exist yet, simpoint-checkpoint.py is run once first to
+take them. With `--store`, the checkpoints are kept in a deduplicating
+checkpoint store (see util/checkpoint_store.py) instead.
+
+The run of SimPoint N goes to
+`<checkpoint dir>/runs-<SimPoints file stem>-I<interval>/simpoint{N}-run`, so
+runs of different SimPoint sets never mix. SimPoints that already have a
+finished run there are skipped, and failed runs are retried `--retries`
+times. When every SimPoint has run,
+the stats are combined with util/simpoint_predictor.py.
+
+Usage
+-----
+
+python3 run-all-simpoint.py
+python3 run-all-simpoint.py --gem5=/path/to/gem5.opt --mem-per-job=4
+python3 run-all-simpoint.py --binary=/path/to/binary
+python3 run-all-simpoint.py --simpoints-file=granularity.simpts \
+    --weights-file=granularity.weights --interval=2000000 \
+    --checkpoint-dir=simpoint-checkpoint-2000000
+
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+# The shared helpers live in 09-sampling/util
+sys.path.append(Path(__file__).resolve().parents[1].as_posix())
+from util.checkpoint_store import CheckpointStore
+from util.simpoint_predictor import (
+    predict,
+    read_simpoints,
+    simpoint_runs_dir,
+)
+from util.stats_reader import BEGIN_MARKER
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+
+def available_memory() -> int:
+    """
+    The memory available for new processes in bytes.
+    """
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+
+
+def default_jobs(mem_per_job: float) -> int:
+    by_memory = int(available_memory() // (mem_per_job * 2**30))
+    return max(1, min(os.cpu_count() or 1, by_memory))
+
+
+def is_finished(run_dir: Path) -> bool:
+    """
+    A SimPoint run is finished when its stats file has both the dump at the
+    end of the warmup and the dump of the SimPoint interval.
+    """
+    stats_file = run_dir / "stats.txt"
+    if not stats_file.is_file():
+        return False
+    with open(stats_file, "r") as f:
+        return sum(BEGIN_MARKER in line for line in f) >= 2
+
+
+def take_checkpoints(
+    gem5: str,
+    checkpoint_dir: Path,
+    store: Optional[str],
+    workload_args: list,
+) -> None:
+    subprocess.run(
+        [
+            gem5,
+            "-re",
+            "--outdir=simpoint-checkpoint-m5out",
+            (SCRIPT_DIR / "simpoint-checkpoint.py").as_posix(),
+            f"--checkpoint-dir={checkpoint_dir}",
+        ]
+        + workload_args
+        + ([f"--store={store}"] if store else []),
+        check=True,
+    )
+
+
+def run_simpoint(
+    gem5: str,
+    sid: int,
+    checkpoint_dir: Path,
+    runs_dir: Path,
+    store: Optional[str],
+    workload_args: list,
+    retries: int,
+) -> bool:
+    run_dir = runs_dir / f"simpoint{sid}-run"
+    if is_finished(run_dir):
+        print(f"gem5 with sid {sid} already finished, skipping it")
+        return True
+    for attempt in range(retries + 1):
+        result = subprocess.run(
+            [
+                gem5,
+                "-re",
+                f"--outdir={run_dir}",
+                (SCRIPT_DIR / "simpoint-run.py").as_posix(),
+                f"--sid={sid}",
+                f"--checkpoint-dir={checkpoint_dir}",
+            ]
+            + workload_args
+            + ([f"--store={store}"] if store else [])
+        )
+        if result.returncode == 0 and is_finished(run_dir):
+            print(f"gem5 with sid {sid} finished")
+            return True
+        print(
+            f"gem5 with sid {sid} failed with exit code {result.returncode} "
+            f"(attempt {attempt + 1} of {retries + 1})"
+        )
+    return False
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--gem5",
+    type=str,
+    default="gem5",
+    help="Path to the gem5 binary",
+)
+parser.add_argument(
+    "--checkpoint-dir",
+    type=str,
+    default="simpoint-checkpoint",
+    help="Directory with (or for) the checkpoints of simpoint-checkpoint.py",
+)
+parser.add_argument(
+    "--store",
+    type=str,
+    default=None,
+    help="Checkpoint store with (or for) the checkpoints",
+)
+parser.add_argument(
+    "--binary",
+    type=str,
+    default=None,
+    help="The binary the SimPoints were found for (default: the default of "
+    "simpoint-run.py)",
+)
+parser.add_argument("--simpoints-file", type=str, default="results.simpts")
+parser.add_argument(
+    "--interval",
+    type=int,
+    default=1_000_000,
+    help="The SimPoint interval size the SimPoints were found with. Use a "
+    "--checkpoint-dir per interval size, the checkpoints depend on it.",
+)
+parser.add_argument("--weights-file", type=str, default="results.weights")
+parser.add_argument(
+    "--jobs",
+    type=int,
+    default=None,
+    help="Maximum number of gem5 processes to run at the same time",
+)
+parser.add_argument(
+    "--mem-per-job",
+    type=float,
+    default=2.0,
+    help="Host memory in GiB that one gem5 process needs. Used to limit the "
+    "number of processes when --jobs is not given.",
+)
+parser.add_argument(
+    "--retries",
+    type=int,
+    default=1,
+    help="Number of times to retry a failed SimPoint run",
+)
+parser.add_argument(
+    "--stat",
+    type=str,
+    action="append",
+    default=None,
+    help="Stat to predict. Can be given many times "
+    "(default: board.processor.cores.core.ipc).",
+)
+args = parser.parse_args()
+
+simpoints = read_simpoints(args.simpoints_file, args.weights_file)
+if not simpoints:
+    print(f"{args.simpoints_file} has no SimPoints, nothing to run")
+    sys.exit(1)
+
+# The gem5 scripts read the same SimPoints as the prediction.
+workload_args = [
+    f"--simpoints-file={Path(args.simpoints_file).resolve()}",
+    f"--weights-file={Path(args.weights_file).resolve()}",
+]
+if args.binary:
+    workload_args.append(f"--binary={Path(args.binary).resolve()}")
+workload_args.append(f"--interval={args.interval}")
+
+checkpoint_dir = Path(args.checkpoint_dir)
+runs_dir = simpoint_runs_dir(
+    checkpoint_dir, args.simpoints_file, args.interval
+)
+stored = set()
+if args.store:
+    with CheckpointStore(args.store) as store:
+        stored = set(store.get_names())
+missing = [
+    sid
+    for sid in range(len(simpoints))
+    if not is_finished(runs_dir / f"simpoint{sid}-run")
+    and not (checkpoint_dir / f"cpt.SimPoint{sid}").is_dir()
+    and f"cpt.SimPoint{sid}" not in stored
+]
+if missing:
+    print(f"Taking the SimPoint checkpoints in {checkpoint_dir}")
+    take_checkpoints(args.gem5, checkpoint_dir, args.store, workload_args)
+runs_dir.mkdir(parents=True, exist_ok=True)
+jobs = min(args.jobs or default_jobs(args.mem_per_job), len(simpoints))
+print(f"Running {len(simpoints)} SimPoints with {jobs} jobs")
+
+with ThreadPoolExecutor(max_workers=jobs) as executor:
+    finished = list(
+        executor.map(
+            lambda sid: run_simpoint(
+                args.gem5,
+                sid,
+                checkpoint_dir,
+                runs_dir,
+                args.store,
+                workload_args,
+                args.retries,
+            ),
+            range(len(simpoints)),
+        )
+    )
+
+failed = [sid for sid, ok in enumerate(finished) if not ok]
+if failed:
+    print(f"SimPoints {failed} failed, not predicting the whole program")
+    sys.exit(1)
+
+predictions = predict(
+    runs_dir,
+    args.simpoints_file,
+    args.weights_file,
+    args.stat or ["board.processor.cores.core.ipc"],
+)
+for stat_name, predicted in predictions.items():
+    print(f"{stat_name}: {predicted}")
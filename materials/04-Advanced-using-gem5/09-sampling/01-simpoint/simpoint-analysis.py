@@ -47,6 +47,15 @@ from gem5.utils.requires import requires
 
 requires(isa_required=ISA.X86)
 
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--binary",
+    type=str,
+    default="/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/workload/simple_workload",
+    help="The binary to simulate",
+)
+args = parser.parse_args()
+
 cache_hierarchy = NoCache()
 
 memory = SingleChannelDDR3_1600(size="3GB")
@@ -67,7 +76,7 @@ board = SimpleBoard(
 )
 
 board.set_se_binary_workload(
-    binary=BinaryResource(local_path=Path("/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/workload/simple_workload").as_posix())
+    binary=BinaryResource(local_path=args.binary)
 )
 
 
@@ -30,9 +30,17 @@ Usage
 
 gem5 -re --outdir=simpoint-checkpoint-m5out simpoint-checkpiont.py
 
+To keep the checkpoints in a deduplicating checkpoint store (see
+util/checkpoint_store.py) instead of as full directories:
+
+gem5 -re --outdir=simpoint-checkpoint-m5out simpoint-checkpiont.py \
+    --store=checkpoint-store
+
 """
 
 import argparse
+import shutil
+import sys
 from pathlib import Path
 
 from gem5.components.boards.simple_board import SimpleBoard
@@ -48,8 +56,50 @@ from gem5.simulate.simulator import Simulator
 from gem5.resources.resource import BinaryResource
 from gem5.utils.requires import requires
 
+# The shared helpers live in 09-sampling/util
+sys.path.append(Path(__file__).resolve().parents[1].as_posix())
+from util.checkpoint_store import CheckpointStore
+
 requires(isa_required=ISA.X86)
 
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--binary",
+    type=str,
+    default="/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/workload/simple_workload",
+    help="The binary to simulate",
+)
+parser.add_argument(
+    "--simpoints-file",
+    type=str,
+    default="/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/results.simpts",
+)
+parser.add_argument(
+    "--interval",
+    type=int,
+    default=1_000_000,
+    help="The SimPoint interval size the SimPoints were found with",
+)
+parser.add_argument(
+    "--weights-file",
+    type=str,
+    default="/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/results.weights",
+)
+parser.add_argument(
+    "--checkpoint-dir",
+    type=str,
+    default="simpoint-checkpoint",
+    help="Directory to save the SimPoint checkpoints to",
+)
+parser.add_argument(
+    "--store",
+    type=str,
+    default=None,
+    help="Move the checkpoints into this checkpoint store after the "
+    "simulation",
+)
+args = parser.parse_args()
+
 cache_hierarchy = NoCache()
 
 memory = SingleChannelDDR3_1600(size="3GB")
@@ -68,18 +118,18 @@ board = SimpleBoard(
 )
 
 simpoint_info = SimPoint(
-    simpoint_interval=1_000_000,
-    simpoint_file_path=Path("/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/results.simpts"),
-    weight_file_path=Path("/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/results.weights"),
+    simpoint_interval=args.interval,
+    simpoint_file_path=Path(args.simpoints_file),
+    weight_file_path=Path(args.weights_file),
     warmup_interval=1_000_000
 )
 
 board.set_se_simpoint_workload(
-    binary=BinaryResource(local_path=Path("/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/workload/simple_workload").as_posix()),
+    binary=BinaryResource(local_path=args.binary),
     simpoint=simpoint_info
 )
 
-dir = Path("simpoint-checkpoint")
+dir = Path(args.checkpoint_dir)
 
 simulator = Simulator(
     board=board,
@@ -93,3 +143,10 @@ simulator = Simulator(
 simulator.run()
 
 print("Simulation Done")
+
+if args.store:
+    with CheckpointStore(args.store) as store:
+        for checkpoint in sorted(dir.glob("cpt.SimPoint*")):
+            store.add(checkpoint)
+            shutil.rmtree(checkpoint)
+            print(f"Moved {checkpoint} to {args.store}")
@@ -0,0 +1,216 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Run every ELFie region of a workload and estimate the whole program.
+
+The regions and their weights come from a regions file (see
+util/elfie_regions.py). Every ELFie holds only its own region, so every
+region of the file has to name its ELFie (`workload` or `binary`) unless the
+regions are run on the full program with `--binary`. Every region runs as
+its own gem5 process (`run-elfies.py --region`), with at most `--jobs`
+processes at a time, and the stats of the regions are combined with their
+weights.
+
+The run of region `name` goes to `runs-<regions file stem>/region{name}`.
+Regions that already have a finished run there are not run again.
+
+By default, the regions of wrf-s.1 in wrf-s.1-regions.json are run. The file
+was written with `util.elfie_regions.write_regions` and has the region of
+the wrf-s.1_globalr13 ELFie. Add the other regions of wrf-s.1, with their
+ELFie resource and weight, to it to estimate the whole program.
+
+Usage
+-----
+
+python3 run-elfie-regions.py --gem5=/path/to/gem5.opt --jobs=4
+python3 run-elfie-regions.py --regions=my-regions.json
+
+The regions picked by looppoint-regions.py run on the binary that was
+profiled:
+
+python3 run-elfie-regions.py --regions=looppoint-regions.json \
+    --binary=/path/to/binary --argument=32768 --argument=8 --num-cores=9
+
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# The shared helpers live in 09-sampling/util
+sys.path.append(Path(__file__).resolve().parents[2].as_posix())
+from util.elfie_regions import read_regions, weighted_estimate
+from util.stats_reader import BEGIN_MARKER, iter_stat_dumps
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+
+def is_finished(outdir: Path) -> bool:
+    """
+    A region run is finished when its stats file has the dump at the end
+    marker of the region.
+    """
+    stats_file = outdir / "stats.txt"
+    if not stats_file.is_file():
+        return False
+    with open(stats_file, "r") as f:
+        return any(BEGIN_MARKER in line for line in f)
+
+
+def run_region(
+    gem5: str, regions_file: Path, name: str, workload_args: list
+) -> Path:
+    """
+    Run one region and return its output directory.
+
+    Regions that already have a finished run are not run again.
+    """
+    outdir = Path(f"runs-{regions_file.stem}") / f"region{name}"
+    if not is_finished(outdir):
+        subprocess.run(
+            [
+                gem5,
+                "-re",
+                f"--outdir={outdir}",
+                (SCRIPT_DIR / "run-elfies.py").as_posix(),
+                f"--regions={regions_file}",
+                f"--region={name}",
+            ]
+            + workload_args,
+            check=True,
+        )
+        print(f"region {name} finished")
+    return outdir
+
+
+def read_region_stats(outdir: Path, patterns: list) -> dict:
+    # The first dump is the one at the end marker of the region.
+    for dump in iter_stat_dumps(outdir / "stats.txt", patterns):
+        return dump
+    raise ValueError(f"{outdir}/stats.txt has no stats.")
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--gem5",
+    type=str,
+    default="gem5",
+    help="Path to the gem5 binary",
+)
+parser.add_argument(
+    "--regions",
+    type=str,
+    default=(SCRIPT_DIR / "wrf-s.1-regions.json").as_posix(),
+    help="The regions file",
+)
+parser.add_argument(
+    "--jobs",
+    type=int,
+    default=os.cpu_count(),
+    help="Maximum number of gem5 processes to run at the same time",
+)
+parser.add_argument(
+    "--binary",
+    type=str,
+    default=None,
+    help="Run the regions that do not name their ELFie on this binary",
+)
+parser.add_argument(
+    "--argument",
+    type=str,
+    action="append",
+    default=[],
+    help="Argument of --binary. Can be given many times.",
+)
+parser.add_argument(
+    "--num-cores",
+    type=int,
+    default=None,
+    help="Number of cores (default: the default of run-elfies.py)",
+)
+parser.add_argument(
+    "--stat",
+    type=str,
+    action="append",
+    default=None,
+    help="Stat name or glob pattern to estimate. Can be given many times "
+    "(default: the IPC of every core).",
+)
+args = parser.parse_args()
+
+workload_args = []
+if args.binary:
+    workload_args.append(f"--binary={Path(args.binary).resolve()}")
+workload_args.extend(f"--argument={argument}" for argument in args.argument)
+if args.num_cores:
+    workload_args.append(f"--num-cores={args.num_cores}")
+
+regions_file = Path(args.regions).resolve()
+if not regions_file.is_file():
+    parser.error(f"{regions_file} does not exist")
+regions = read_regions(regions_file)
+if not args.binary:
+    missing = [
+        region.name
+        for region in regions
+        if region.workload is None and region.binary is None
+    ]
+    if len(regions) > 1 and missing:
+        parser.error(
+            f"these regions do not name their ELFie: {', '.join(missing)}. "
+            "Every region would run on the same ELFie. Add their workload "
+            "or binary to the regions file, or run the full program with "
+            "--binary."
+        )
+print(f"Running {len(regions)} regions with {args.jobs} jobs")
+
+with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+    outdirs = list(
+        executor.map(
+            lambda region: run_region(
+                args.gem5, regions_file, region.name, workload_args
+            ),
+            regions,
+        )
+    )
+
+# The cores are `switch*` when run-elfies.py fast-forwards --binary.
+patterns = args.stat or [
+    "board.processor.cores*.core.ipc",
+    "board.processor.switch*.core.ipc",
+]
+estimate = weighted_estimate(
+    regions, [read_region_stats(outdir, patterns) for outdir in outdirs]
+)
+for name, value in estimate.items():
+    print(f"{name}: {value}")
+if args.stat is None:
+    # The IPC of the whole system is the sum of the IPC of its cores.
+    print(f"total IPC: {sum(estimate.values())}")
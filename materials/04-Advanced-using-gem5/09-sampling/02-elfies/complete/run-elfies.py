@@ -26,6 +26,7 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from gem5.components.processors.simple_processor import SimpleProcessor
+from gem5.components.processors.simple_switchable_processor import SimpleSwitchableProcessor
 from gem5.components.memory.multi_channel import DualChannelDDR4_2400
 from gem5.components.processors.cpu_types import CPUTypes
 from gem5.components.boards.simple_board import SimpleBoard
@@ -34,19 +35,128 @@ from gem5.components.cachehierarchies.classic.private_l1_shared_l2_cache_hierarc
 from gem5.simulate.simulator import ExitEvent
 from gem5.simulate.simulator import Simulator
 from gem5.resources.elfie import ELFieInfo
-from gem5.resources.resource import obtain_resource
+from gem5.resources.resource import BinaryResource, obtain_resource
 from gem5.utils.requires import requires
 from m5.params import PcCountPair
 from gem5.isas import ISA
+from pathlib import Path
+import argparse
+import sys
 import m5
 
+# The shared helpers live in 09-sampling/util
+sys.path.append(Path(__file__).resolve().parents[2].as_posix())
+from util.elfie_regions import find_region, read_regions
+from util.stats_snapshot import DEFAULT_SUBSET_STATS, StatsSubsetWriter
+
 requires(isa_required = ISA.X86)
 
 '''
 Usage:
     gem5 -re run-elfies.py
+
+To dump only a few stats of the region to m5out/stats-subset.txt:
+    gem5 -re run-elfies.py --stats-subset=stats-subset.txt --stat="*.ipc"
+
+To run one of the regions in a regions file (see util/elfie_regions.py) on
+the ELFie the region names:
+    gem5 -re run-elfies.py --regions=wrf-s.1-regions.json --region=13
+
+run-elfie-regions.py runs every region in parallel.
+
+To run a region of a multithreaded binary picked by looppoint-regions.py
+instead of an ELFie (the binary runs on ATOMIC cores up to the start of the
+region and on TIMING cores in the region):
+    gem5 -re run-elfies.py --regions=looppoint-regions.json --region=7 \
+        --binary=/path/to/binary --argument=32768 --argument=8 --num-cores=9
 '''
 
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--stats-subset",
+    type=str,
+    default=None,
+    help="Write only the stats given with --stat to this text file in the "
+    "output directory instead of calling m5.stats.dump()",
+)
+parser.add_argument(
+    "--stat",
+    type=str,
+    action="append",
+    default=None,
+    help="Stat name or glob pattern to include in --stats-subset. "
+    "Can be given many times.",
+)
+parser.add_argument(
+    "--workload",
+    type=str,
+    default="wrf-s.1_globalr13",
+    help="The ELFie workload resource",
+)
+parser.add_argument(
+    "--binary",
+    type=str,
+    default=None,
+    help="Run this binary instead of the --workload resource",
+)
+parser.add_argument(
+    "--argument",
+    type=str,
+    action="append",
+    default=None,
+    help="Argument of --binary. Can be given many times.",
+)
+parser.add_argument(
+    "--num-cores",
+    type=int,
+    default=8,
+    help="Number of cores",
+)
+parser.add_argument(
+    "--regions",
+    type=str,
+    default=None,
+    help="File with the region markers (see util/elfie_regions.py)",
+)
+parser.add_argument(
+    "--region",
+    type=str,
+    default=None,
+    help="Name of the region in --regions to run",
+)
+args = parser.parse_args()
+
+# The full program given with --binary runs every instruction before the
+# region, so it is fast-forwarded on ATOMIC cores up to the start marker. An
+# ELFie starts right at its region.
+fast_forward = args.binary is not None
+
+if args.regions:
+    if args.region is None:
+        parser.error("--region is required with --regions")
+    region = find_region(read_regions(args.regions), args.region)
+    print(f"Running {region}")
+    # An ELFie only holds its own region, so the region's ELFie is used
+    # instead of --binary and --workload when the regions file names one.
+    if region.binary:
+        args.binary = region.binary
+        fast_forward = False
+    elif region.workload:
+        args.binary = None
+        args.workload = region.workload
+        fast_forward = False
+    start = PcCountPair(region.start_pc, region.start_count)
+    end = PcCountPair(region.end_pc, region.end_count)
+else:
+    start = PcCountPair(int("0x100b643",0),1)
+    end = PcCountPair(int("0x526730",0),297879)
+
+if args.stats_subset:
+    stats_writer = StatsSubsetWriter(
+        Path(m5.options.outdir) / args.stats_subset,
+        args.stat or DEFAULT_SUBSET_STATS,
+    )
+
 cache_hierarchy = PrivateL1SharedL2CacheHierarchy(
     l1i_size="32KiB",
     l1i_assoc=8,
@@ -58,10 +168,18 @@ cache_hierarchy = PrivateL1SharedL2CacheHierarchy(
 
 memory = DualChannelDDR4_2400("3GB")
 
-processor = SimpleProcessor(
-    # This processor uses a simple timing CPU with 8 cores
-    cpu_type=CPUTypes.TIMING, isa=ISA.X86,num_cores=8
-)
+if fast_forward:
+    processor = SimpleSwitchableProcessor(
+        starting_core_type=CPUTypes.ATOMIC,
+        switch_core_type=CPUTypes.TIMING,
+        isa=ISA.X86,
+        num_cores=args.num_cores,
+    )
+else:
+    processor = SimpleProcessor(
+        # This processor uses a simple timing CPU with 8 cores by default
+        cpu_type=CPUTypes.TIMING, isa=ISA.X86,num_cores=args.num_cores
+    )
 
 board = SimpleBoard(
     processor = processor,
@@ -70,15 +188,28 @@ board = SimpleBoard(
     clk_freq = "2GHz"
 )
 
-board.set_se_binary_workload(
-    binary=obtain_resource("wrf-s.1_globalr13")
-)
-
-elfie = ELFieInfo(start = PcCountPair(int("0x100b643",0),1), end = PcCountPair(int("0x526730",0),297879) )
-
-elfie.setup_processor(
-    processor = processor
-)
+if args.binary:
+    board.set_se_binary_workload(
+        binary=BinaryResource(local_path=args.binary),
+        arguments=args.argument or [],
+    )
+else:
+    board.set_se_binary_workload(
+        binary=obtain_resource(args.workload)
+    )
+
+elfie = ELFieInfo(start = start, end = end)
+
+if fast_forward:
+    # setup_processor only sees the cores that run first, but the markers
+    # have to be counted by both the ATOMIC and the TIMING cores.
+    for cores in processor._switchable_cores.values():
+        for core in cores:
+            core.add_pc_tracker_probe(elfie.get_targets(), elfie.get_manager())
+else:
+    elfie.setup_processor(
+        processor = processor
+    )
 
 targets = elfie.get_targets()
 
@@ -88,6 +219,9 @@ def start_end_handler():
     # When we reach the start marker, we reset the stats and
     # continue the simulation.
     print(f"reached {targets[0]}\n")
+    if fast_forward:
+        print("switch to the TIMING cores\n")
+        processor.switch()
     print("now reset stats\n")
     m5.stats.reset()
     print("fall back to simulation\n")
@@ -96,7 +230,10 @@ def start_end_handler():
     # and exit the simulation.
     print(f"reached {targets[1]}\n")
     print("now dump stats and exit simulation\n")
-    m5.stats.dump()
+    if args.stats_subset:
+        stats_writer.dump()
+    else:
+        m5.stats.dump()
     yield True
 
 simulator = Simulator(
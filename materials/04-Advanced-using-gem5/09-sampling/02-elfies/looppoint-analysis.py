@@ -0,0 +1,235 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Profile all threads of a multithreaded workload for region selection.
+
+The program runs with ATOMIC cores and no caches. Every core has a
+`LooppointAnalysis` probe that counts the basic blocks and the backward
+branches (loop iterations) of its thread, and all of them report to one
+`LooppointAnalysisManager`. Every `--region-length` instructions, summed
+over all threads, the manager exits the simulation loop. The handler then
+records
+- the BBV of every thread in the region (the basic blocks its core ran),
+- the global BBV of the region (the basic blocks of all threads), and
+- the most recent backward branch PC and how many times it has executed
+in total, which marks the end of the region in a way that does not depend
+on how the threads were scheduled,
+and starts a new region.
+
+The profile is written to `looppoint-profile.json` in the output directory.
+looppoint-regions.py clusters it into a regions file for run-elfies.py and
+run-elfie-regions.py.
+
+By default, the naive array_sum binary of the cache coherence homework is
+profiled. If homework/cache-coherence/workloads/array_sum/naive-gem5 does
+not exist, build it first:
+
+cd homework/cache-coherence/workloads/array_sum && make naive-gem5
+
+Usage
+-----
+
+gem5 -re --outdir=looppoint-analysis-m5out looppoint-analysis.py
+gem5 -re --outdir=looppoint-analysis-m5out looppoint-analysis.py \
+    --binary=/path/to/binary --argument=32768 --argument=8 --num-cores=9
+
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from gem5.components.boards.simple_board import SimpleBoard
+from gem5.components.cachehierarchies.classic.no_cache import NoCache
+from gem5.components.memory.single_channel import SingleChannelDDR3_1600
+from gem5.components.processors.cpu_types import CPUTypes
+from gem5.components.processors.simple_processor import SimpleProcessor
+from gem5.isas import ISA
+from gem5.simulate.exit_event import ExitEvent
+from gem5.simulate.simulator import Simulator
+from gem5.resources.resource import BinaryResource
+from gem5.utils.requires import requires
+from m5.objects import AddrRange, LooppointAnalysis, LooppointAnalysisManager
+import m5
+
+requires(isa_required=ISA.X86)
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--binary",
+    type=str,
+    default=(
+        Path(__file__).resolve().parents[4]
+        / "homework"
+        / "cache-coherence"
+        / "workloads"
+        / "array_sum"
+        / "naive-gem5"
+    ).as_posix(),
+    help="The multithreaded binary to profile",
+)
+parser.add_argument(
+    "--argument",
+    type=str,
+    action="append",
+    default=None,
+    help="Argument of the binary. Can be given many times "
+    "(default: 32768 8, an array of 32768 elements summed by 8 threads).",
+)
+parser.add_argument(
+    "--num-cores",
+    type=int,
+    default=9,
+    help="Number of cores. The array_sum binaries need one core per thread "
+    "plus one for the main thread.",
+)
+parser.add_argument(
+    "--region-length",
+    type=int,
+    default=1_000_000,
+    help="Number of instructions (over all threads) in a region",
+)
+args = parser.parse_args()
+
+if not Path(args.binary).is_file():
+    parser.error(
+        f"{args.binary} does not exist. Build it with `make naive-gem5` in "
+        "homework/cache-coherence/workloads/array_sum or give --binary."
+    )
+
+cache_hierarchy = NoCache()
+
+memory = SingleChannelDDR3_1600(size="3GB")
+
+processor = SimpleProcessor(
+    cpu_type=CPUTypes.ATOMIC,
+    isa=ISA.X86,
+    num_cores=args.num_cores,
+)
+
+manager = LooppointAnalysisManager()
+manager.region_length = args.region_length
+
+# One probe per core (thread), which also keeps the BBV of its thread.
+analyses = []
+for core in processor.get_cores():
+    analysis = LooppointAnalysis()
+    analysis.looppoint_analysis_manager = manager
+    # Only count the basic blocks and loops of the program itself, not of
+    # the shared libraries, whose addresses are far above it.
+    analysis.bb_valid_addr_range = AddrRange(start=0, size="2GiB")
+    analysis.marker_valid_addr_range = AddrRange(start=0, size="2GiB")
+    core.core.probeListener = analysis
+    analyses.append(analysis)
+
+board = SimpleBoard(
+    clk_freq="3GHz",
+    processor=processor,
+    memory=memory,
+    cache_hierarchy=cache_hierarchy,
+)
+board.looppoint_analysis_manager = manager
+
+board.set_se_binary_workload(
+    binary=BinaryResource(local_path=args.binary),
+    arguments=args.argument or ["32768", "8"],
+)
+
+regions = []
+
+
+def record_region():
+    """
+    Record the BBVs and the end marker of the region that just ended and
+    start counting a new region.
+    """
+    pc = manager.getMostRecentBackwardBranchPC()
+    regions.append(
+        {
+            "instructions": manager.getGlobalInstCounter(),
+            "bbv": {
+                str(block): count
+                for block, count in manager.getGlobalBBV().items()
+            },
+            "thread_bbvs": [
+                {
+                    str(block): count
+                    for block, count in analysis.getLocalBBV().items()
+                }
+                for analysis in analyses
+            ],
+            "end": {
+                "pc": hex(pc),
+                "count": manager.getBackwardBranchCounter().get(pc, 0),
+            },
+        }
+    )
+    manager.clearGlobalBBV()
+    manager.clearGlobalInstCounter()
+    for analysis in analyses:
+        analysis.clearLocalBBV()
+
+
+def region_handler():
+    while True:
+        record_region()
+        print(f"end of region {len(regions) - 1}")
+        yield False
+
+
+simulator = Simulator(
+    board=board,
+    on_exit_event={
+        # The manager exits with the same cause as a SimPoint start.
+        ExitEvent.SIMPOINT_BEGIN: region_handler(),
+    },
+)
+
+simulator.run()
+
+# The rest of the program after the last full region.
+if manager.getGlobalInstCounter() > 0:
+    record_region()
+
+with open(Path(m5.options.outdir) / "looppoint-profile.json", "w") as f:
+    json.dump(
+        {
+            "binary": args.binary,
+            "region_length": args.region_length,
+            # The number of instructions of every basic block, to weight the
+            # BBVs by instructions like LoopPoint does.
+            "bb_instructions": {
+                str(block): length
+                for block, length in manager.getBBInstMap().items()
+            },
+            "regions": regions,
+        },
+        f,
+    )
+
+print("Simulation Done")
+print(f"Profiled {len(regions)} regions")
@@ -0,0 +1,216 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Pick representative regions of a multithreaded program from the profile of
+looppoint-analysis.py and write them as a regions file.
+
+The BBVs of the threads of every region are concatenated into one vector,
+so a basic block run by thread 0 and the same block run by thread 1 are
+different dimensions, as in LoopPoint. The vector is weighted by the number
+of instructions of every basic block, normalized and clustered like SimPoint
+BBVs (see util/simpoint_cluster.py). The region closest to the
+center of every cluster represents it, with the fraction of the program's
+instructions that the cluster executed as its weight.
+
+A region starts at the end marker of the region before it, so the first
+region, which starts at the beginning of the program, is never picked. If
+it is alone in its cluster, its weight goes to the closest representative.
+
+The regions file can be used with run-elfies.py and run-elfie-regions.py
+(`--regions=looppoint-regions.json`) to simulate the regions with detailed
+cores.
+
+Usage
+-----
+
+python3 looppoint-regions.py
+python3 looppoint-regions.py --profile=looppoint-analysis-m5out/looppoint-profile.json \
+    --max-k=10 --regions-file=looppoint-regions.json
+
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# The shared helpers live in 09-sampling/util
+sys.path.append(Path(__file__).resolve().parents[1].as_posix())
+from util.bbv import bbv_from_counts
+from util.elfie_regions import Region, write_regions
+from util.simpoint_cluster import (
+    BIC_THRESHOLD,
+    KMEANS_SEED,
+    PROJECTED_DIMENSIONS,
+    PROJECTION_SEED,
+    cluster,
+    normalize,
+    random_projection,
+)
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--profile",
+    type=str,
+    default="looppoint-analysis-m5out/looppoint-profile.json",
+    help="The profile written by looppoint-analysis.py",
+)
+parser.add_argument(
+    "--max-k",
+    type=int,
+    default=10,
+    help="Largest number of clusters to try",
+)
+parser.add_argument(
+    "--dimensions",
+    type=int,
+    default=PROJECTED_DIMENSIONS,
+    help="Number of dimensions to project the BBVs to",
+)
+parser.add_argument(
+    "--num-init",
+    type=int,
+    default=5,
+    help="Number of k-means runs with different initial centers per k",
+)
+parser.add_argument(
+    "--bic-threshold",
+    type=float,
+    default=BIC_THRESHOLD,
+    help="Pick the smallest k with a BIC score this far between the "
+    "worst and the best score",
+)
+parser.add_argument(
+    "--jobs",
+    type=int,
+    default=None,
+    help="Number of processes (default: number of host cores)",
+)
+parser.add_argument(
+    "--regions-file", type=str, default="looppoint-regions.json"
+)
+args = parser.parse_args()
+
+with open(args.profile, "r") as f:
+    profile = json.load(f)
+
+profiled = profile["regions"]
+if len(profiled) < 2:
+    raise ValueError(
+        f"{args.profile} has {len(profiled)} region(s); use a smaller "
+        "--region-length in looppoint-analysis.py."
+    )
+
+bb_instructions = {
+    int(block): length for block, length in profile["bb_instructions"].items()
+}
+# The column of every (thread, basic block) pair.
+columns = {}
+
+
+def thread_counts(region: dict) -> dict:
+    counts = {}
+    for thread, thread_bbv in enumerate(region["thread_bbvs"]):
+        for block, count in thread_bbv.items():
+            column = columns.setdefault((thread, int(block)), len(columns))
+            counts[column] = count * bb_instructions.get(int(block), 1)
+    return counts
+
+
+bbv = bbv_from_counts(thread_counts(region) for region in profiled)
+num_regions, num_columns = bbv.get_shape()
+print(
+    f"Read {num_regions} regions with {num_columns} (thread, basic block) "
+    "pairs"
+)
+
+points = random_projection(normalize(bbv), args.dimensions, PROJECTION_SEED)
+k, labels, scores = cluster(
+    points,
+    max_k=args.max_k,
+    num_init=args.num_init,
+    seed=KMEANS_SEED,
+    threshold=args.bic_threshold,
+    max_workers=args.jobs,
+)
+print(f"Picked k = {k}")
+
+instructions = np.array([region["instructions"] for region in profiled])
+
+
+def can_start(index: int) -> bool:
+    # The region needs a start marker (the end of the region before it) and
+    # an end marker.
+    return (
+        index > 0
+        and profiled[index - 1]["end"]["count"] > 0
+        and profiled[index]["end"]["count"] > 0
+    )
+
+
+# The representative of every cluster and the instructions it stands for.
+picked = {}
+orphans = []
+for label in np.unique(labels):
+    members = np.flatnonzero(labels == label)
+    center = points[members].mean(axis=0)
+    candidates = [index for index in members if can_start(index)]
+    if not candidates:
+        orphans.append((center, instructions[members].sum()))
+        continue
+    distances = ((points[candidates] - center) ** 2).sum(axis=1)
+    picked[int(candidates[distances.argmin()])] = instructions[members].sum()
+
+if not picked:
+    raise ValueError("None of the regions has both a start and end marker.")
+
+for center, orphan_instructions in orphans:
+    indices = list(picked)
+    distances = ((points[indices] - center) ** 2).sum(axis=1)
+    picked[indices[distances.argmin()]] += orphan_instructions
+
+regions = []
+for index in sorted(picked):
+    start = profiled[index - 1]["end"]
+    end = profiled[index]["end"]
+    regions.append(
+        Region(
+            name=str(index),
+            start_pc=int(start["pc"], 0),
+            start_count=start["count"],
+            end_pc=int(end["pc"], 0),
+            end_count=end["count"],
+            weight=picked[index] / instructions.sum(),
+        )
+    )
+
+write_regions(regions, args.regions_file)
+for region in regions:
+    print(region)
+print(f"Wrote {len(regions)} regions to {args.regions_file}")
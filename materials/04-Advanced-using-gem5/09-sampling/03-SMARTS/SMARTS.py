@@ -30,6 +30,34 @@ Usage
 
 gem5 -re SMARTS.py
 
+To write each sample's stats as a compact binary snapshot (see
+util/stats_snapshot.py) instead of dumping all of the stats as text:
+
+gem5 -re SMARTS.py --stats-snapshot=stats.bin
+
+or to write only a few stats in the stats.txt format:
+
+gem5 -re SMARTS.py --stats-subset=stats-subset.txt
+
+To stop detailed sampling once the IPC estimate is within 3% with 99.7%
+confidence and finish the program with the ATOMIC core:
+
+gem5 -re SMARTS.py --target-error=0.03
+
+To compare cache warming policies, e.g. fast-forwarding without touching
+the caches and relying on 4000 instructions of detailed warmup:
+
+gem5 -re SMARTS.py --warming=detailed --warmup-length=4000 \
+    --actual-ipc=1.247741
+
+--warming=detailed needs a gem5 version with the private
+m5.simulate._changeMemoryMode (gem5 v24.0 has it), since gem5 has no public
+way to change the memory mode of a running system. SMARTS.py exits with an
+error before the simulation starts if it is missing.
+
+Every run writes a sampling-report.json with the host time, the number of
+samples, and the IPC estimate (and its error if --actual-ipc is given).
+
 """
 
 import argparse
@@ -49,10 +77,129 @@ from gem5.simulate.simulator import Simulator
 from gem5.resources.resource import BinaryResource
 from gem5.utils.requires import requires
 import json
+import sys
+import time
 import m5
 
+# The shared helpers live in 09-sampling/util
+sys.path.append(Path(__file__).resolve().parents[1].as_posix())
+from util.smarts_estimator import Z_95, Z_99_7, RunningEstimate
+from util.stats_snapshot import (
+    DEFAULT_SUBSET_STATS,
+    StatsSnapshotWriter,
+    StatsSubsetWriter,
+    read_stat_values,
+    resolve_stats,
+)
+
 requires(isa_required=ISA.X86)
 
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--binary",
+    type=str,
+    default="/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/workload/simple_workload",
+    help="The binary to simulate",
+)
+parser.add_argument(
+    "--stats-snapshot",
+    type=str,
+    default=None,
+    help="Write the stats of every sample to this binary file in the output "
+    "directory instead of calling m5.stats.dump()",
+)
+parser.add_argument(
+    "--stats-subset",
+    type=str,
+    default=None,
+    help="Write only the stats given with --snapshot-stat of every sample "
+    "to this text file in the output directory instead of calling "
+    "m5.stats.dump()",
+)
+parser.add_argument(
+    "--snapshot-stat",
+    type=str,
+    action="append",
+    default=None,
+    help="Stat name or glob pattern to include in the snapshots or the "
+    "stats subset. Can be given many times.",
+)
+parser.add_argument(
+    "--target-error",
+    type=float,
+    default=None,
+    help="Stop detailed sampling once the relative error bound of the IPC "
+    "estimate is below this value (e.g., 0.03 for 3%%)",
+)
+parser.add_argument(
+    "--confidence",
+    type=str,
+    choices=["95", "99.7"],
+    default="99.7",
+    help="Confidence level (in %%) of the error bound for --target-error",
+)
+parser.add_argument(
+    "--min-samples",
+    type=int,
+    default=30,
+    help="Minimum number of samples before --target-error can stop sampling",
+)
+parser.add_argument(
+    "--exit-when-done",
+    action="store_true",
+    help="Exit the simulation when --target-error is reached instead of "
+    "finishing the program with the ATOMIC core",
+)
+parser.add_argument(
+    "--warming",
+    type=str,
+    choices=["functional", "detailed", "none"],
+    default="functional",
+    help="How the caches are warmed before each sample. 'functional' "
+    "fast-forwards with atomic accesses through the caches and then runs "
+    "the detailed warmup, 'detailed' fast-forwards around the caches so "
+    "only the detailed warmup warms them (this needs "
+    "m5.simulate._changeMemoryMode), and 'none' does neither",
+)
+parser.add_argument(
+    "--warmup-length",
+    type=int,
+    default=None,
+    help="Number of instructions of detailed warmup before each sample "
+    "(default: 2 * U, ignored with --warming=none)",
+)
+parser.add_argument(
+    "--actual-ipc",
+    type=float,
+    default=None,
+    help="IPC of a full detailed run to report the sampling error against",
+)
+args = parser.parse_args()
+
+if args.stats_snapshot:
+    snapshot_writer = StatsSnapshotWriter(
+        Path(m5.options.outdir) / args.stats_snapshot,
+        args.snapshot_stat
+        or [
+            "simInsts",
+            "board.processor.switch.core.ipc",
+            "board.processor.switch.core.numCycles",
+        ],
+    )
+elif args.stats_subset:
+    snapshot_writer = StatsSubsetWriter(
+        Path(m5.options.outdir) / args.stats_subset,
+        args.snapshot_stat or DEFAULT_SUBSET_STATS,
+    )
+
+
+def dump_stats():
+    if args.stats_snapshot or args.stats_subset:
+        snapshot_writer.dump()
+    else:
+        m5.stats.dump()
+
+
 cache_hierarchy = PrivateL1PrivateL2WalkCacheHierarchy(
     l1d_size="32kB",
     l1i_size="32kB",
@@ -76,35 +223,112 @@ board = SimpleBoard(
 )
 
 board.set_se_binary_workload(
-    binary=BinaryResource(local_path=Path("/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/workload/simple_workload").as_posix())
+    binary=BinaryResource(local_path=args.binary)
 )
 
+def can_bypass_caches() -> bool:
+    # gem5 has no public function to change the memory mode of a running
+    # system, so bypass_caches relies on the private one m5.switchCpus uses.
+    return hasattr(m5.simulate, "_changeMemoryMode")
+
+
+def bypass_caches(board):
+    """
+    Write back and invalidate the caches and switch the memory system to
+    atomic_noncaching so the ATOMIC core fast-forwards without warming them.
+    This is what m5.switchCpus does before switching to a KVM core.
+    """
+    if not can_bypass_caches():
+        raise RuntimeError(
+            "This gem5 version has no m5.simulate._changeMemoryMode, so the "
+            "caches cannot be bypassed. Use --warming=functional or "
+            "--warming=none."
+        )
+    m5.drain()
+    m5.memWriteback(board)
+    m5.memInvalidate(board)
+    # m5.switchCpus calls this itself, but only to match the memory mode of
+    # the new CPUs, and the ATOMIC core needs atomic.
+    m5.simulate._changeMemoryMode(board, m5.objects.params.atomic_noncaching)
+
+
+ipc_stat = None
+
+
+def current_sample_ipc():
+    """
+    The IPC of the detailed core since the last stats reset.
+    """
+    global ipc_stat
+    if ipc_stat is None:
+        # Stats can only be resolved after the simulation is instantiated.
+        ipc_stat = resolve_stats(["board.processor.switch.core.ipc"])
+    return read_stat_values(ipc_stat)[0]
+
+
 def smarts_generator(
-    k: int, U: int, W: int, processor
+    k: int,
+    U: int,
+    W: int,
+    board,
+    processor,
+    target_error=None,
+    z=Z_99_7,
+    min_samples=30,
+    exit_when_done=False,
+    warm_caches=True,
+    running_ipc=None,
 ):
     """
     :param k: the systematic sampling interval. Each interval simulation k*U
     instructions. The interval includes the fast-forwarding part, detailed
     warmup part, and the detail simulation part.
     :param U: sampling unit size. The instruction length in each unit.
-    :param W: the length of the detailed warmup part.
+    :param W: the length of the detailed warmup part. If it is 0, the stats
+    are reset as soon as the core is switched.
+    :param board: the board of `processor`, whose caches are bypassed if
+    `warm_caches` is False.
 
     Each interval instruction length is k*U.
     The warmup part starts at (k-1)*U-W
     The detailed simulation part starts at (k-1)*U
 
     This exit generator only works with SwitchableProcessor.
+    The first exit is right at the start of the program. The generator then
+    bypasses the caches if `warm_caches` is False and schedules the start of
+    the first detailed warmup part, so the first sample is fast-forwarded to
+    like every other one.
     When it reaches to the start of the detailed warmup part, it resets the
     stats; then it switches the core type and schedule for the end of the
     warmup part and the end of the interval. When it reaches to the end of the
     detailed warmup part, it resets the stats. When it reaches to the end of
     the detailed simulation, it dumps the stats; then it switches the core type
     and schedule for the start of the next detailed warmup part.
+
+    :param target_error: If not None, the IPC of every sample is added to a
+    running estimate. Once the relative error bound of the estimate (with
+    the confidence given by `z`) is at most `target_error` and there are at
+    least `min_samples` samples, no more samples are scheduled. The program
+    then finishes with the ATOMIC core, or the simulation exits if
+    `exit_when_done` is True.
+    :param warm_caches: If False, the caches are bypassed while
+    fast-forwarding so only the detailed warmup warms them.
+    :param running_ipc: The RunningEstimate to add the IPC of every sample
+    to. A new one is used if it is None.
     """
     is_switchable = isinstance(processor, SimpleSwitchableProcessor)
     warmup_start = U * (k - 1) - W
     warmup_plus_detailed = U + W
     counter = 0
+    if running_ipc is None:
+        running_ipc = RunningEstimate()
+
+    if is_switchable:
+        print("got to the start of the program\n")
+        if not warm_caches:
+            bypass_caches(board)
+        processor.get_cores()[0]._set_simpoint([warmup_start], True)
+        yield False
 
     while is_switchable:
         print(f"curTick is {m5.curTick()}")
@@ -113,19 +337,27 @@ def smarts_generator(
         print("switch core type")
         # switch core type
         processor.switch()
-        print(
-            "now schedule for end of warmup and start of detailed simluation\n"
-        )
-        # schedule for warmup end
-        # schedule for detailed simulation end
-        processor.get_cores()[0]._set_simpoint([W, warmup_plus_detailed], True)
-        print("fall back to simulation\n")
-        # fall back to simualtion
-        yield False
+        if W > 0:
+            print(
+                "now schedule for end of warmup and start of detailed "
+                "simluation\n"
+            )
+            # schedule for warmup end
+            # schedule for detailed simulation end
+            processor.get_cores()[0]._set_simpoint(
+                [W, warmup_plus_detailed], True
+            )
+            print("fall back to simulation\n")
+            # fall back to simualtion
+            yield False
 
-        # reached warmup end
-        print(f"curTick is {m5.curTick()}")
-        print("got to detail simulation start\n")
+            # reached warmup end
+            print(f"curTick is {m5.curTick()}")
+            print("got to detail simulation start\n")
+        else:
+            # without detailed warmup, the detailed simulation starts now
+            print("now schedule for end of detailed simulation\n")
+            processor.get_cores()[0]._set_simpoint([U], True)
         print("now reset m5 stats\n")
 
         # reset stats
@@ -139,11 +371,30 @@ def smarts_generator(
         print("got to end of detail simulation\n")
         print("now dump stats\n")
         # dump stats
-        m5.stats.dump()
+        dump_stats()
+
+        running_ipc.add(current_sample_ipc())
+        print(
+            f"sample {running_ipc.num_samples}: IPC estimate "
+            f"{running_ipc.mean} +/-{running_ipc.relative_error(z)*100}%\n"
+        )
+        if target_error is not None and running_ipc.is_converged(
+            target_error, z, min_samples
+        ):
+            print("reached the target error, stop detailed sampling\n")
+            processor.switch()
+            if not warm_caches:
+                bypass_caches(board)
+            # Without scheduling another warmup start, the rest of the
+            # program runs with the ATOMIC core.
+            yield exit_when_done
+            return
 
         # switch core type
         print("switch core type\n")
         processor.switch()
+        if not warm_caches:
+            bypass_caches(board)
         print(
             "now schedule for next warmup start and detail simulation start\n"
         )
@@ -157,11 +408,24 @@ def smarts_generator(
         print("fall back to simulation\n")
         yield False
 
+if args.warming == "detailed" and not can_bypass_caches():
+    parser.error(
+        "--warming=detailed needs m5.simulate._changeMemoryMode, which this "
+        "gem5 version does not have"
+    )
+
 program_length = 9115640
 ideal_region_length = math.ceil(program_length/50)
 ideal_U = 1000
 ideal_k = math.ceil(ideal_region_length/ideal_U)
-ideal_W = 2 * ideal_U
+if args.warming == "none":
+    ideal_W = 0
+elif args.warmup_length is not None:
+    ideal_W = args.warmup_length
+else:
+    ideal_W = 2 * ideal_U
+
+running_ipc = RunningEstimate()
 
 simulator = Simulator(
     board=board,
@@ -170,12 +434,42 @@ simulator = Simulator(
             k=ideal_k,
             U=ideal_U,
             W=ideal_W,
+            board=board,
             processor=processor,
+            target_error=args.target_error,
+            z=Z_95 if args.confidence == "95" else Z_99_7,
+            min_samples=args.min_samples,
+            exit_when_done=args.exit_when_done,
+            warm_caches=args.warming == "functional",
+            running_ipc=running_ipc,
         )
     }
 )
 
+# Exit right away to set up the first fast-forward (see smarts_generator).
 processor.get_cores()[0]._set_simpoint([1], False)
+start_time = time.time()
 simulator.run()
+host_seconds = time.time() - start_time
 
 print("Simulation Done")
+
+report = {
+    "warming": args.warming,
+    "U": ideal_U,
+    "W": ideal_W,
+    "k": ideal_k,
+    "host_seconds": host_seconds,
+    "num_samples": running_ipc.num_samples,
+    "detailed_instructions": running_ipc.num_samples * (ideal_U + ideal_W),
+    "ipc": running_ipc.mean,
+    "ipc_error_bound_99_7": running_ipc.relative_error(Z_99_7),
+}
+if args.actual_ipc is not None:
+    report["actual_ipc"] = args.actual_ipc
+    report["ipc_error"] = (
+        abs(running_ipc.mean - args.actual_ipc) / args.actual_ipc
+    )
+print(report)
+with open(Path(m5.options.outdir) / "sampling-report.json", "w") as f:
+    json.dump(report, f, indent=2)
@@ -0,0 +1,216 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Run SMARTS sampling in parallel from checkpoints.
+
+SMARTS.py simulates the samples one after the other in a single gem5
+process. This script instead
+1. runs smarts-checkpoint.py once (if the checkpoints do not exist yet) to
+save a checkpoint before the detailed warmup of every sample, then
+2. runs smarts-sample-run.py for every checkpoint, with up to `--jobs` gem5
+processes at a time, and
+3. combines the IPC of the samples with the SMARTS estimator.
+
+The runs of the samples are written to
+`<checkpoint dir>/runs-U{U}-W{W}-k{k}/sample{N}`, so taking new checkpoints
+with other parameters never reuses old runs. Samples whose run has both the
+dump at the end of the warmup and the dump of the sample are not run again.
+
+Usage
+-----
+
+python3 smarts-parallel.py --gem5=/path/to/gem5.opt --jobs=8
+
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# The shared helpers live in 09-sampling/util
+sys.path.append(Path(__file__).resolve().parents[2].as_posix())
+from util.smarts_estimator import Z_95, Z_99_7, SampleEstimate
+from util.stats_reader import BEGIN_MARKER, iter_stat_dumps
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+
+def take_checkpoints(gem5: str, checkpoint_dir: Path, extra_args: list):
+    subprocess.run(
+        [
+            gem5,
+            "-re",
+            "--outdir=smarts-checkpoint-m5out",
+            (SCRIPT_DIR / "smarts-checkpoint.py").as_posix(),
+            f"--checkpoint-dir={checkpoint_dir}",
+        ]
+        + extra_args,
+        check=True,
+    )
+
+
+def is_finished(outdir: Path) -> bool:
+    """
+    A sample run is finished when its stats file has both the dump at the
+    end of the warmup and the dump of the sample.
+    """
+    stats_file = outdir / "stats.txt"
+    if not stats_file.is_file():
+        return False
+    with open(stats_file, "r") as f:
+        return sum(BEGIN_MARKER in line for line in f) >= 2
+
+
+def run_sample(
+    gem5: str, checkpoint_dir: Path, runs_dir: Path, sample: int
+) -> Path:
+    """
+    Run one sample and return its output directory.
+
+    Samples that already have a finished run are not run again.
+    """
+    outdir = runs_dir / f"sample{sample}"
+    if not is_finished(outdir):
+        subprocess.run(
+            [
+                gem5,
+                "-re",
+                f"--outdir={outdir}",
+                (SCRIPT_DIR / "smarts-sample-run.py").as_posix(),
+                f"--sample={sample}",
+                f"--checkpoint-dir={checkpoint_dir}",
+            ],
+            check=True,
+        )
+    return outdir
+
+
+def read_sample_ipc(outdir: Path, stat_name: str) -> float:
+    # The last dump is the sample, the first one is the end of the warmup.
+    last_dump = {}
+    for dump in iter_stat_dumps(outdir / "stats.txt", [stat_name]):
+        last_dump = dump
+    if not stat_name in last_dump:
+        raise ValueError(f"Could not find {stat_name} in {outdir}/stats.txt")
+    return last_dump[stat_name]
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--gem5",
+    type=str,
+    default="gem5",
+    help="Path to the gem5 binary",
+)
+parser.add_argument(
+    "--checkpoint-dir",
+    type=str,
+    default="smarts-checkpoint",
+    help="Directory with (or for) the checkpoints of smarts-checkpoint.py",
+)
+parser.add_argument(
+    "--jobs",
+    type=int,
+    default=os.cpu_count(),
+    help="Maximum number of gem5 processes to run at the same time",
+)
+parser.add_argument(
+    "--stat",
+    type=str,
+    default="board.processor.cores.core.ipc",
+    help="The stat to estimate",
+)
+parser.add_argument(
+    "--actual-ipc",
+    type=float,
+    default=None,
+    help="IPC of the full detailed run to compare against",
+)
+parser.add_argument(
+    "checkpoint_args",
+    nargs=argparse.REMAINDER,
+    help="Arguments passed to smarts-checkpoint.py when the checkpoints "
+    "are taken (e.g., -- --unit-size=1000 --num-samples=100)",
+)
+args = parser.parse_args()
+
+checkpoint_dir = Path(args.checkpoint_dir)
+if not (checkpoint_dir / "samples.json").is_file():
+    print(f"Taking the checkpoints in {checkpoint_dir}")
+    take_checkpoints(
+        args.gem5,
+        checkpoint_dir,
+        [arg for arg in args.checkpoint_args if arg != "--"],
+    )
+
+with open(checkpoint_dir / "samples.json", "r") as f:
+    samples = json.load(f)
+num_samples = len(samples["warmup_starts"])
+runs_dir = (
+    checkpoint_dir / f"runs-U{samples['U']}-W{samples['W']}-k{samples['k']}"
+)
+print(
+    f"Running {num_samples} samples (U = {samples['U']}, W = {samples['W']}, "
+    f"k = {samples['k']}) with {args.jobs} jobs"
+)
+
+# The work is done by the gem5 processes, so threads are enough to wait on
+# them.
+with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+    outdirs = list(
+        executor.map(
+            lambda sample: run_sample(
+                args.gem5, checkpoint_dir, runs_dir, sample
+            ),
+            range(num_samples),
+        )
+    )
+
+estimate = SampleEstimate(
+    [read_sample_ipc(outdir, args.stat) for outdir in outdirs]
+)
+
+print(f"Number of samples: {estimate.num_samples}")
+print(f"Predicted Overall IPC: {estimate.mean}")
+print(f"Coefficient of variation: {estimate.coefficient_of_variation}")
+for name, z in (("95%", Z_95), ("99.7%", Z_99_7)):
+    low, high = estimate.confidence_interval(z)
+    print(
+        f"{name} confidence interval: [{low}, {high}] "
+        f"(+/-{estimate.relative_error(z)*100}%)"
+    )
+if args.actual_ipc is not None:
+    print(f"Actual Overall IPC: {args.actual_ipc}")
+    print(
+        "Relative Error: "
+        f"{(math.fabs(estimate.mean - args.actual_ipc)/args.actual_ipc)*100}%"
+    )
@@ -1,20 +1,88 @@
+import argparse
 from pathlib import Path
 import math
+import sys
 
-stats_file = Path("/workspaces/2024/materials/02-Using-gem5/09-sampling/03-SMARTS/m5out/stats.txt")
+# The shared helpers live in 09-sampling/util
+sys.path.append(Path(__file__).resolve().parents[1].as_posix())
+from util.smarts_estimator import (
+    Z_95,
+    Z_99_7,
+    SampleEstimate,
+    read_smarts_samples,
+    sampling_interval,
+)
+from util.stats_snapshot import read_stats_snapshots
 
-with stats_file.open("r") as f:
-    num_samples = 0
-    sample_ipc = []
-    for line in f:
-        if "board.processor.switch.core.ipc" in line:
-            line = line.split()
-            ipc = float(line[1])
-            sample_ipc.append(ipc)
-            num_samples += 1
-    num_samples -= 1
-    avg_ipc = sum(sample_ipc[:-1]) / num_samples
-    print(f"Number of samples: {num_samples}")
-    print(f"Predicted Overall IPC: {avg_ipc}")
-    print(f"Actual Overall IPC: 1.247741")
-    print(f"Relative Error: {(math.fabs(avg_ipc - 1.247741)/1.247741)*100}%")
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--stats-file",
+    type=str,
+    default="/workspaces/2024/materials/02-Using-gem5/09-sampling/03-SMARTS/m5out/stats.txt",
+)
+parser.add_argument(
+    "--stats-snapshot",
+    type=str,
+    default=None,
+    help="Read the samples from a binary snapshot file written with "
+    "SMARTS.py --stats-snapshot instead of the stats file",
+)
+parser.add_argument(
+    "--actual-ipc",
+    type=float,
+    default=1.247741,
+    help="IPC of the full detailed run",
+)
+parser.add_argument(
+    "--unit-size",
+    type=int,
+    default=1000,
+    help="The sampling unit size U used in SMARTS.py",
+)
+parser.add_argument(
+    "--program-length",
+    type=int,
+    default=9115640,
+    help="Number of instructions in the program",
+)
+parser.add_argument(
+    "--target-error",
+    type=float,
+    default=0.03,
+    help="Target relative error for the sample size advice (0.03 is 3%%)",
+)
+args = parser.parse_args()
+
+if args.stats_snapshot:
+    # Every snapshot is a sample.
+    names, _, values = read_stats_snapshots(args.stats_snapshot)
+    sample_ipc = values[:, names.index("board.processor.switch.core.ipc")]
+else:
+    sample_ipc = read_smarts_samples(
+        args.stats_file, "board.processor.switch.core.ipc", args.unit_size
+    )
+estimate = SampleEstimate(sample_ipc)
+
+print(f"Number of samples: {estimate.num_samples}")
+print(f"Predicted Overall IPC: {estimate.mean}")
+print(f"Variance: {estimate.variance}")
+print(f"Coefficient of variation: {estimate.coefficient_of_variation}")
+for name, z in (("95%", Z_95), ("99.7%", Z_99_7)):
+    low, high = estimate.confidence_interval(z)
+    print(
+        f"{name} confidence interval: [{low}, {high}] "
+        f"(+/-{estimate.relative_error(z)*100}%)"
+    )
+print(f"Actual Overall IPC: {args.actual_ipc}")
+print(
+    "Relative Error: "
+    f"{(math.fabs(estimate.mean - args.actual_ipc)/args.actual_ipc)*100}%"
+)
+
+num_samples = estimate.required_samples(args.target_error, Z_99_7)
+k = sampling_interval(num_samples, args.program_length, args.unit_size)
+print(
+    f"Samples needed for +/-{args.target_error*100}% error with 99.7% "
+    f"confidence: {num_samples} "
+    f"(ideal_k = {k} with ideal_U = {args.unit_size})"
+)
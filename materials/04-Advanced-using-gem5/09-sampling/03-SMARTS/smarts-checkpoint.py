@@ -0,0 +1,169 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+The first phase of parallel SMARTS (see smarts-parallel.py).
+
+This runs the whole program once with the ATOMIC core and no caches and
+saves a checkpoint at the start of the detailed warmup of every sample. The
+checkpoints can then be restored by smarts-sample-run.py in any order and in
+parallel.
+
+Sample `i` measures instructions [(i*k + k-1)*U, (i*k + k)*U) and its
+detailed warmup starts W instructions earlier, like in SMARTS.py. The
+sampling parameters are written to `samples.json` in the checkpoint
+directory so the sample runs use the same U and W.
+
+Usage
+-----
+
+gem5 -re --outdir=smarts-checkpoint-m5out smarts-checkpoint.py
+
+"""
+
+import argparse
+import json
+import math
+from pathlib import Path
+
+from gem5.components.boards.simple_board import SimpleBoard
+from gem5.components.cachehierarchies.classic.no_cache import NoCache
+from gem5.components.memory.single_channel import SingleChannelDDR3_1600
+from gem5.components.processors.cpu_types import CPUTypes
+from gem5.components.processors.simple_processor import SimpleProcessor
+from gem5.isas import ISA
+from gem5.simulate.exit_event import ExitEvent
+from gem5.simulate.simulator import Simulator
+from gem5.resources.resource import BinaryResource
+from gem5.utils.requires import requires
+
+requires(isa_required=ISA.X86)
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--checkpoint-dir",
+    type=str,
+    default="smarts-checkpoint",
+    help="Directory to save the checkpoints to",
+)
+parser.add_argument(
+    "--program-length",
+    type=int,
+    default=9115640,
+    help="Number of instructions in the program",
+)
+parser.add_argument(
+    "--unit-size",
+    type=int,
+    default=1000,
+    help="The sampling unit size U",
+)
+parser.add_argument(
+    "--warmup-length",
+    type=int,
+    default=None,
+    help="Number of instructions of detailed warmup before each sample "
+    "(default: 2 * U)",
+)
+parser.add_argument(
+    "--num-samples",
+    type=int,
+    default=50,
+    help="Number of samples over the whole program",
+)
+args = parser.parse_args()
+
+U = args.unit_size
+W = 2 * U if args.warmup_length is None else args.warmup_length
+k = math.ceil(math.ceil(args.program_length / args.num_samples) / U)
+if W > (k - 1) * U:
+    raise ValueError(
+        f"The warmup ({W} instructions) is longer than the part of the "
+        f"sampling interval before the sample ({(k - 1) * U} instructions)."
+    )
+
+warmup_starts = []
+sample = 0
+while (sample * k + k) * U <= args.program_length:
+    warmup_starts.append((sample * k + k - 1) * U - W)
+    sample += 1
+
+checkpoint_dir = Path(args.checkpoint_dir)
+checkpoint_dir.mkdir(parents=True, exist_ok=True)
+with open(checkpoint_dir / "samples.json", "w") as f:
+    json.dump(
+        {"U": U, "W": W, "k": k, "warmup_starts": warmup_starts}, f, indent=2
+    )
+
+cache_hierarchy = NoCache()
+
+memory = SingleChannelDDR3_1600(size="3GB")
+
+processor = SimpleProcessor(
+    cpu_type=CPUTypes.ATOMIC,
+    isa=ISA.X86,
+    num_cores=1,
+)
+
+board = SimpleBoard(
+    clk_freq="3GHz",
+    processor=processor,
+    memory=memory,
+    cache_hierarchy=cache_hierarchy,
+)
+
+board.set_se_binary_workload(
+    binary=BinaryResource(local_path=Path("/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/workload/simple_workload").as_posix())
+)
+
+
+def save_checkpoint_generator(checkpoint_dir: Path, num_samples: int):
+    """
+    Save a checkpoint named `cpt.sample{i}` at the i-th SIMPOINT_BEGIN exit
+    and exit the simulation after the last one.
+    """
+    for sample in range(num_samples):
+        print(f"saving the checkpoint of sample {sample}")
+        simulator.save_checkpoint(checkpoint_dir / f"cpt.sample{sample}")
+        yield sample == num_samples - 1
+
+
+simulator = Simulator(
+    board=board,
+    on_exit_event={
+        ExitEvent.SIMPOINT_BEGIN: save_checkpoint_generator(
+            checkpoint_dir, len(warmup_starts)
+        )
+    },
+)
+
+# The warmup starts are absolute instruction counts because the board is not
+# initialized yet.
+processor.get_cores()[0]._set_simpoint(warmup_starts, False)
+simulator.run()
+
+print("Simulation Done")
+print(f"Saved {len(warmup_starts)} checkpoints to {checkpoint_dir}")
@@ -0,0 +1,138 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+The second phase of parallel SMARTS (see smarts-parallel.py).
+
+This restores the checkpoint of one sample saved by smarts-checkpoint.py
+and runs the detailed warmup and the sample with the O3 core. The stats are
+dumped at the end of the warmup and at the end of the sample, so the last
+dump in stats.txt is the sample itself.
+
+The checkpoints are taken without caches, so only the detailed warmup warms
+the caches (like SMARTS.py --warming=detailed).
+
+Usage
+-----
+
+gem5 -re --outdir=smarts-sample[N]-run smarts-sample-run.py --sample=[N]
+
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from gem5.components.boards.simple_board import SimpleBoard
+from gem5.components.cachehierarchies.classic.private_l1_private_l2_walk_cache_hierarchy import (
+    PrivateL1PrivateL2WalkCacheHierarchy,
+)
+from gem5.components.memory import DualChannelDDR4_2400
+from gem5.simulate.exit_event import ExitEvent
+from gem5.components.processors.cpu_types import CPUTypes
+from gem5.components.processors.simple_processor import SimpleProcessor
+from gem5.isas import ISA
+from gem5.simulate.simulator import Simulator
+from gem5.resources.resource import BinaryResource
+from gem5.utils.requires import requires
+import m5
+
+requires(isa_required=ISA.X86)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--sample", type=int, required=True)
+parser.add_argument(
+    "--checkpoint-dir",
+    type=str,
+    default="smarts-checkpoint",
+    help="Directory with the checkpoints saved by smarts-checkpoint.py",
+)
+args = parser.parse_args()
+
+checkpoint_dir = Path(args.checkpoint_dir)
+with open(checkpoint_dir / "samples.json", "r") as f:
+    samples = json.load(f)
+checkpoint = checkpoint_dir / f"cpt.sample{args.sample}"
+if not checkpoint.is_dir():
+    raise FileNotFoundError(f"Could not find the checkpoint {checkpoint}.")
+U = samples["U"]
+W = samples["W"]
+
+cache_hierarchy = PrivateL1PrivateL2WalkCacheHierarchy(
+    l1d_size="32kB",
+    l1i_size="32kB",
+    l2_size="256kB",
+)
+
+memory = DualChannelDDR4_2400(size="3GB")
+
+processor = SimpleProcessor(
+    cpu_type=CPUTypes.O3,
+    isa=ISA.X86,
+    num_cores=1,
+)
+
+board = SimpleBoard(
+    clk_freq="3GHz",
+    processor=processor,
+    memory=memory,
+    cache_hierarchy=cache_hierarchy,
+)
+
+board.set_se_binary_workload(
+    binary=BinaryResource(local_path=Path("/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/workload/simple_workload").as_posix()),
+    checkpoint=checkpoint,
+)
+
+
+def max_inst():
+    warmed_up = False
+    while True:
+        if warmed_up:
+            print("end of sample")
+            yield True
+        else:
+            print("end of warmup, starting to simulate the sample")
+            warmed_up = True
+            # Schedule a MAX_INSTS exit event at the end of the sample
+            simulator.schedule_max_insts(U)
+            m5.stats.dump()
+            m5.stats.reset()
+            yield False
+
+
+simulator = Simulator(
+    board=board,
+    on_exit_event={ExitEvent.MAX_INSTS: max_inst()},
+)
+
+# A warmup of 0 instructions would never exit, so warm up for at least one.
+print(f"Starting Simulation with warmup {max(W, 1)}")
+simulator.schedule_max_insts(max(W, 1))
+simulator.run()
+
+print("Simulation Done")
+print(f"Ran sample {args.sample}")
@@ -0,0 +1,279 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Sample in detail only the phases that have not been seen before.
+
+The program runs in intervals of `--interval-length` instructions. Every
+core of the switchable processor has a `LooppointAnalysis` probe, and a
+`LooppointAnalysisManager` exits the simulation loop at the end of every
+interval with the BBV of the interval. The BBV is classified right away with
+the random-projected phase signatures of util/phase_signatures.py:
+- If the interval belongs to a phase whose CPI has not been measured yet,
+  the next interval runs with the O3 core, and its CPI is added to the
+  phase it turns out to belong to.
+- Otherwise the next interval runs with the ATOMIC core, which keeps the
+  caches warm, and the CPI measured for its phase is reused.
+
+This gives a SimPoint-like estimate in one pass, without the offline
+profiling and clustering steps. At the end, the CPI of every interval's
+phase is weighted by the instructions of the interval.
+
+Every run writes a sampling-report.json with the host time, the number of
+phases, the number of instructions simulated with the O3 core and the IPC
+estimate (and its error if --actual-ipc is given). The IPC is null when the
+program is shorter than one interval, since no interval then runs on the O3
+core.
+
+Usage
+-----
+
+gem5 -re --outdir=online-phase-m5out online-phase.py
+gem5 -re --outdir=online-phase-m5out online-phase.py --threshold=0.3 \
+    --actual-ipc=1.247741
+
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from gem5.components.boards.simple_board import SimpleBoard
+from gem5.components.cachehierarchies.classic.private_l1_private_l2_walk_cache_hierarchy import (
+    PrivateL1PrivateL2WalkCacheHierarchy,
+)
+from gem5.components.memory import DualChannelDDR4_2400
+from gem5.components.processors.cpu_types import CPUTypes
+from gem5.components.processors.simple_switchable_processor import SimpleSwitchableProcessor
+from gem5.isas import ISA
+from gem5.simulate.exit_event import ExitEvent
+from gem5.simulate.simulator import Simulator
+from gem5.resources.resource import BinaryResource
+from gem5.utils.requires import requires
+from m5.objects import AddrRange, LooppointAnalysis, LooppointAnalysisManager
+import m5
+
+# The shared helpers live in 09-sampling/util
+sys.path.append(Path(__file__).resolve().parents[2].as_posix())
+from util.phase_signatures import (
+    PHASE_THRESHOLD,
+    SIGNATURE_DIMENSIONS,
+    PhaseSignatureCache,
+)
+from util.stats_snapshot import read_stat_values, resolve_stats
+
+requires(isa_required=ISA.X86)
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--binary",
+    type=str,
+    default="/workspaces/2024/materials/02-Using-gem5/09-sampling/01-simpoint/workload/simple_workload",
+    help="The binary to simulate",
+)
+parser.add_argument(
+    "--interval-length",
+    type=int,
+    default=100_000,
+    help="Number of instructions in an interval",
+)
+parser.add_argument(
+    "--threshold",
+    type=float,
+    default=PHASE_THRESHOLD,
+    help="Largest signature distance between an interval and a phase for "
+    "the interval to belong to the phase (0 to sqrt(2))",
+)
+parser.add_argument(
+    "--dimensions",
+    type=int,
+    default=SIGNATURE_DIMENSIONS,
+    help="Number of dimensions of the phase signatures",
+)
+parser.add_argument(
+    "--actual-ipc",
+    type=float,
+    default=None,
+    help="The IPC of the full detailed run, to report the error of the "
+    "estimate",
+)
+args = parser.parse_args()
+
+cache_hierarchy = PrivateL1PrivateL2WalkCacheHierarchy(
+    l1d_size="32kB",
+    l1i_size="32kB",
+    l2_size="256kB",
+)
+
+memory = DualChannelDDR4_2400(size="3GB")
+
+processor = SimpleSwitchableProcessor(
+    starting_core_type=CPUTypes.ATOMIC,
+    switch_core_type=CPUTypes.O3,
+    isa=ISA.X86,
+    num_cores=1,
+)
+
+manager = LooppointAnalysisManager()
+manager.region_length = args.interval_length
+
+# Both the ATOMIC and the O3 core count the basic blocks, so every interval
+# has a BBV whichever core runs it.
+for cores in processor._switchable_cores.values():
+    for core in cores:
+        analysis = LooppointAnalysis()
+        analysis.looppoint_analysis_manager = manager
+        analysis.bb_valid_addr_range = AddrRange(start=0, size="2GiB")
+        analysis.marker_valid_addr_range = AddrRange(start=0, size="2GiB")
+        core.core.probeListener = analysis
+
+board = SimpleBoard(
+    clk_freq="3GHz",
+    processor=processor,
+    memory=memory,
+    cache_hierarchy=cache_hierarchy,
+)
+board.looppoint_analysis_manager = manager
+
+board.set_se_binary_workload(
+    binary=BinaryResource(local_path=args.binary)
+)
+
+phases = PhaseSignatureCache(
+    dimensions=args.dimensions, threshold=args.threshold
+)
+detailed_instructions = 0
+is_detailed = False
+ipc_stat = None
+
+
+def end_interval():
+    """
+    Classify the interval that just ended and, if it ran with the O3 core,
+    add its CPI to its phase.
+
+    :returns: The phase of the interval.
+    """
+    global detailed_instructions, ipc_stat
+    instructions = manager.getGlobalInstCounter()
+    bb_instructions = manager.getBBInstMap()
+    # Weight the basic blocks by their instructions like SimPoint BBVs.
+    bbv = {
+        block: count * bb_instructions.get(block, 1)
+        for block, count in manager.getGlobalBBV().items()
+    }
+    manager.clearGlobalBBV()
+    manager.clearGlobalInstCounter()
+
+    phase, is_new = phases.classify(bbv, instructions)
+    if is_detailed:
+        if ipc_stat is None:
+            # Stats can only be resolved after the simulation is instantiated.
+            ipc_stat = resolve_stats(["board.processor.switch.core.ipc"])
+        ipc = read_stat_values(ipc_stat)[0]
+        if ipc > 0:
+            phase.add_cpi(1.0 / ipc, instructions)
+        detailed_instructions += instructions
+    print(
+        f"interval {len(phases.intervals) - 1}: phase {phase.phase_id}"
+        f"{' (new)' if is_new else ''}, "
+        f"{'O3' if is_detailed else 'ATOMIC'}"
+    )
+    return phase
+
+
+def phase_handler():
+    global is_detailed
+    while True:
+        phase = end_interval()
+        # The next interval is likely in the same phase, so measure it in
+        # detail if the phase has no CPI yet.
+        if phase.is_measured() == is_detailed:
+            processor.switch()
+            is_detailed = not is_detailed
+        if is_detailed:
+            m5.stats.reset()
+        yield False
+
+
+simulator = Simulator(
+    board=board,
+    on_exit_event={
+        # The manager exits with the same cause as a SimPoint start.
+        ExitEvent.SIMPOINT_BEGIN: phase_handler(),
+    },
+)
+
+start_time = time.time()
+simulator.run()
+host_seconds = time.time() - start_time
+
+# The rest of the program after the last full interval.
+if manager.getGlobalInstCounter() > 0:
+    end_interval()
+
+print("Simulation Done")
+
+if any(phase.is_measured() for phase in phases.phases):
+    ipc = 1.0 / phases.estimated_cpi()
+else:
+    # Only happens when the program is shorter than one interval, since the
+    # interval after the first one always runs on the O3 core.
+    total_instructions = sum(
+        instructions for instructions, _ in phases.intervals
+    )
+    print(
+        "No interval ran on the O3 core, so there is no IPC estimate. The "
+        f"program ran {total_instructions} instructions; use a smaller "
+        "--interval-length."
+    )
+    ipc = None
+report = {
+    "interval_length": args.interval_length,
+    "threshold": args.threshold,
+    "host_seconds": host_seconds,
+    "num_intervals": len(phases.intervals),
+    "num_phases": len(phases.phases),
+    "detailed_instructions": detailed_instructions,
+    "ipc": ipc,
+    "phases": [
+        {
+            "phase": phase.phase_id,
+            "intervals": phase.num_intervals,
+            "instructions": phase.instructions,
+            "cpi": phase.cpi if phase.is_measured() else None,
+        }
+        for phase in phases.phases
+    ],
+}
+if args.actual_ipc is not None and ipc is not None:
+    report["actual_ipc"] = args.actual_ipc
+    report["ipc_error"] = abs(ipc - args.actual_ipc) / args.actual_ipc
+print(report)
+with open(Path(m5.options.outdir) / "sampling-report.json", "w") as f:
+    json.dump(report, f, indent=2)
@@ -0,0 +1,332 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Compare the speed and accuracy of the sampling methods on the same binaries.
+
+For every binary given with `--binary` (default: simple_workload), this runs
+- `full`: full-detailed-run.py, the reference,
+- `simpoint`: simpoint-analysis.py, simpoint-cluster.py and
+  run-all-simpoint.py (checkpoints and one run per SimPoint), and
+- `smarts`: SMARTS.py, and
+- `online-phase`: 04-online-phase/online-phase.py,
+each in its own directory under `--work-dir`, one step after the other.
+
+For every method, the table has
+- the host wall-clock time of all of its steps,
+- the peak resident memory of its largest process (from `os.wait4`),
+- the number of instructions simulated with the detailed core, including
+  detailed warmup, and
+- the IPC estimate and its relative error against the full detailed run.
+
+The table is printed and written to `--output` as CSV. Methods that already
+ran in the work directory are not run again, so delete the directory of a
+method to measure it again.
+
+The ELFie flow is not part of the comparison: it runs the ELFies of a
+different workload on a different system.
+
+Usage
+-----
+
+python3 benchmark-sampling.py --gem5=/path/to/gem5.opt
+python3 benchmark-sampling.py --binary=/path/to/a --binary=/path/to/b \
+    --method=full --method=smarts
+
+"""
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from util.simpoint_predictor import predict, read_simpoints, simpoint_runs_dir
+from util.stats_reader import iter_stat_dumps
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+IPC_STAT = "board.processor.cores.core.ipc"
+SIMPOINT_INTERVAL = 1_000_000
+METHODS = ["full", "simpoint", "smarts", "online-phase"]
+
+
+def run_measured(command: List[str], cwd: Path) -> Dict[str, float]:
+    """
+    Run `command` in `cwd` and measure it.
+
+    :returns: The wall-clock time in seconds and the peak resident memory in
+    bytes of the process or of the largest of its children.
+    """
+    print(f"[{cwd}] {' '.join(command)}")
+    start = time.time()
+    process = subprocess.Popen(command, cwd=cwd)
+    # Unlike Popen.wait, wait4 also returns the resource usage of the child.
+    # ru_maxrss covers the child and every child it waited for itself.
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.time() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+    # ru_maxrss is in KiB on Linux.
+    return {"host_seconds": seconds, "max_rss": usage.ru_maxrss * 1024}
+
+
+def run_steps(steps: List[List[str]], cwd: Path) -> Dict[str, float]:
+    measurements = [run_measured(step, cwd) for step in steps]
+    return {
+        "host_seconds": sum(m["host_seconds"] for m in measurements),
+        "max_rss": max(m["max_rss"] for m in measurements),
+    }
+
+
+def last_stat(stats_file: Path, name: str) -> float:
+    value = None
+    for dump in iter_stat_dumps(stats_file, [name]):
+        value = dump.get(name, value)
+    if value is None:
+        raise ValueError(f"Could not find {name} in {stats_file}.")
+    return value
+
+
+def run_full(args, binary: Path, cwd: Path) -> Dict[str, float]:
+    outdir = cwd / "full-detailed-run-m5out"
+    script = SCRIPT_DIR / "01-simpoint" / "full-detailed-run.py"
+    result = run_steps(
+        [
+            [
+                args.gem5,
+                "-re",
+                f"--outdir={outdir}",
+                script.as_posix(),
+                f"--binary={binary}",
+            ]
+        ],
+        cwd,
+    )
+    stats_file = outdir / "stats.txt"
+    result["detailed_instructions"] = last_stat(stats_file, "simInsts")
+    result["ipc"] = last_stat(stats_file, IPC_STAT)
+    return result
+
+
+def run_simpoint(args, binary: Path, cwd: Path) -> Dict[str, float]:
+    simpoint_dir = SCRIPT_DIR / "01-simpoint"
+    result = run_steps(
+        [
+            [
+                args.gem5,
+                "-re",
+                "--outdir=simpoint-analysis-m5out",
+                (simpoint_dir / "simpoint-analysis.py").as_posix(),
+                f"--binary={binary}",
+            ],
+            [
+                sys.executable,
+                (simpoint_dir / "simpoint-cluster.py").as_posix(),
+                f"--jobs={args.jobs}",
+            ],
+            [
+                sys.executable,
+                (simpoint_dir / "run-all-simpoint.py").as_posix(),
+                f"--gem5={args.gem5}",
+                f"--binary={binary}",
+                f"--jobs={args.jobs}",
+                "--checkpoint-dir=simpoint-checkpoint",
+                f"--interval={SIMPOINT_INTERVAL}",
+            ],
+        ],
+        cwd,
+    )
+    simpoints_file = cwd / "results.simpts"
+    weights_file = cwd / "results.weights"
+    runs_dir = simpoint_runs_dir(
+        cwd / "simpoint-checkpoint", simpoints_file, SIMPOINT_INTERVAL
+    )
+    # Every SimPoint run simulates its warmup and its interval in detail.
+    # simInsts is not reset with the stats, so the last dump of a run
+    # already counts both. Only the runs of the SimPoints found here count.
+    num_simpoints = len(read_simpoints(simpoints_file, weights_file))
+    result["detailed_instructions"] = sum(
+        last_stat(runs_dir / f"simpoint{sid}-run" / "stats.txt", "simInsts")
+        for sid in range(num_simpoints)
+    )
+    result["ipc"] = predict(
+        runs_dir, simpoints_file, weights_file, [IPC_STAT]
+    )[IPC_STAT]
+    return result
+
+
+def run_report_script(
+    args, binary: Path, cwd: Path, script: Path
+) -> Dict[str, float]:
+    # The script writes its estimate to sampling-report.json.
+    outdir = cwd / f"{script.stem}-m5out"
+    result = run_steps(
+        [
+            [
+                args.gem5,
+                "-re",
+                f"--outdir={outdir}",
+                script.as_posix(),
+                f"--binary={binary}",
+            ]
+        ],
+        cwd,
+    )
+    with open(outdir / "sampling-report.json", "r") as f:
+        report = json.load(f)
+    result["detailed_instructions"] = report["detailed_instructions"]
+    result["ipc"] = report["ipc"]
+    return result
+
+
+def run_smarts(args, binary: Path, cwd: Path) -> Dict[str, float]:
+    return run_report_script(
+        args, binary, cwd, SCRIPT_DIR / "03-SMARTS" / "SMARTS.py"
+    )
+
+
+def run_online_phase(args, binary: Path, cwd: Path) -> Dict[str, float]:
+    return run_report_script(
+        args,
+        binary,
+        cwd,
+        SCRIPT_DIR / "04-online-phase" / "online-phase.py",
+    )
+
+
+RUNNERS = {
+    "full": run_full,
+    "simpoint": run_simpoint,
+    "smarts": run_smarts,
+    "online-phase": run_online_phase,
+}
+
+
+def benchmark(args, binary: Path, method: str) -> Dict[str, float]:
+    """
+    Run `method` on `binary`, or read its results if it already ran.
+    """
+    cwd = Path(args.work_dir).resolve() / binary.name / method
+    result_file = cwd / "benchmark.json"
+    if result_file.is_file():
+        with open(result_file, "r") as f:
+            return json.load(f)
+    cwd.mkdir(parents=True, exist_ok=True)
+    result = RUNNERS[method](args, binary, cwd)
+    with open(result_file, "w") as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--gem5",
+    type=str,
+    default="gem5",
+    help="Path to the gem5 binary",
+)
+parser.add_argument(
+    "--binary",
+    type=str,
+    action="append",
+    default=None,
+    help="Binary to benchmark the methods on. Can be given many times "
+    "(default: 01-simpoint/workload/simple_workload).",
+)
+parser.add_argument(
+    "--method",
+    type=str,
+    action="append",
+    choices=METHODS,
+    default=None,
+    help="Sampling method to benchmark. Can be given many times "
+    "(default: all of them). The full detailed run is always run.",
+)
+parser.add_argument(
+    "--jobs",
+    type=int,
+    default=os.cpu_count(),
+    help="Maximum number of processes a method may use at the same time",
+)
+parser.add_argument("--work-dir", type=str, default="sampling-benchmark")
+parser.add_argument("--output", type=str, default="sampling-benchmark.csv")
+args = parser.parse_args()
+
+binaries = [
+    Path(binary).resolve()
+    for binary in args.binary
+    or [SCRIPT_DIR / "01-simpoint" / "workload" / "simple_workload"]
+]
+methods = ["full"] + [
+    method for method in args.method or METHODS if method != "full"
+]
+
+rows = []
+for binary in binaries:
+    reference = benchmark(args, binary, "full")
+    for method in methods:
+        result = benchmark(args, binary, method)
+        speedup = reference["host_seconds"] / result["host_seconds"]
+        # online-phase.py has no estimate when the program is shorter than
+        # one interval.
+        if result["ipc"] is None:
+            ipc, error = "n/a", "n/a"
+        else:
+            ipc = f"{result['ipc']:.6f}"
+            error = abs(result["ipc"] - reference["ipc"]) / reference["ipc"]
+            error = f"{error:.2%}"
+        rows.append(
+            {
+                "binary": binary.name,
+                "method": method,
+                "host_seconds": f"{result['host_seconds']:.1f}",
+                "speedup": f"{speedup:.2f}",
+                "max_rss_mib": f"{result['max_rss'] / 2**20:.0f}",
+                "detailed_instructions": (
+                    f"{result['detailed_instructions']:.0f}"
+                ),
+                "ipc": ipc,
+                "ipc_error": error,
+            }
+        )
+
+with open(args.output, "w", newline="") as f:
+    writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+
+widths = {
+    name: max(len(name), *(len(row[name]) for row in rows)) for name in rows[0]
+}
+print("  ".join(name.ljust(widths[name]) for name in widths).rstrip())
+for row in rows:
+    print("  ".join(row[name].ljust(widths[name]) for name in widths).rstrip())
+print(f"Wrote the table to {args.output}")
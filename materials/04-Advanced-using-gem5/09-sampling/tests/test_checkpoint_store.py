@@ -0,0 +1,96 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Checks of util/checkpoint_store.py with small fake checkpoints.
+
+Usage
+-----
+
+python3 -m pytest tests
+
+"""
+
+import gzip
+from pathlib import Path
+
+import numpy as np
+
+# util is set up by conftest.py
+from util.checkpoint_store import PACK_FILE_NAME, CheckpointStore
+
+CHUNK_SIZE = 4096
+
+
+def make_checkpoint(path: Path, seed: int, num_chunks: int = 8) -> Path:
+    path.mkdir(parents=True)
+    (path / "m5.cpt").write_text(f"[root]\nseed={seed}\n")
+    memory = np.random.default_rng(seed).bytes(CHUNK_SIZE * num_chunks)
+    # Half of the pages are zeros, like the untouched pages of a memory.
+    memory += bytes(CHUNK_SIZE * num_chunks)
+    with gzip.open(path / "board.physmem.store0.pmem", "wb") as f:
+        f.write(memory)
+    return path
+
+
+def read_dir(path: Path) -> dict:
+    files = {}
+    for file in path.iterdir():
+        opener = gzip.open if file.name.endswith(".pmem") else open
+        with opener(file, "rb") as f:
+            files[file.name] = f.read()
+    return files
+
+
+def test_gc_drops_the_chunks_of_replaced_checkpoints(tmp_path):
+    kept = make_checkpoint(tmp_path / "cpt.SimPoint0", seed=0)
+    old = make_checkpoint(tmp_path / "old" / "cpt.SimPoint1", seed=1)
+    new = make_checkpoint(tmp_path / "new" / "cpt.SimPoint1", seed=2)
+
+    with CheckpointStore(tmp_path / "store", CHUNK_SIZE) as store:
+        store.add(kept)
+        store.add(old)
+        store.add(new)
+        pack_size = (tmp_path / "store" / PACK_FILE_NAME).stat().st_size
+        # The chunks of the replaced cpt.SimPoint1 are only dropped by gc.
+        freed = store.gc()
+        assert 0 < freed < pack_size
+        assert freed == pack_size - (
+            (tmp_path / "store" / PACK_FILE_NAME).stat().st_size
+        )
+        for checkpoint in (kept, new):
+            restored = store.restore(
+                checkpoint.name, tmp_path / "restored" / checkpoint.name
+            )
+            assert read_dir(restored) == read_dir(checkpoint)
+
+        store.remove("cpt.SimPoint1")
+        assert store.get_names() == ["cpt.SimPoint0"]
+        store.gc()
+        restored = store.restore("cpt.SimPoint0", tmp_path / "again")
+        assert read_dir(restored) == read_dir(kept)
+        # Nothing is left to drop.
+        assert store.gc() == 0
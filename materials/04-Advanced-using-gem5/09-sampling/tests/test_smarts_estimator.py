@@ -0,0 +1,125 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Checks of util/smarts_estimator.py against the tracked stats files.
+
+Usage
+-----
+
+python3 -m pytest tests
+
+"""
+
+from fnmatch import fnmatchcase
+from pathlib import Path
+
+# util is set up by conftest.py
+from util import stats_snapshot
+from util.smarts_estimator import read_smarts_samples
+from util.stats_snapshot import DEFAULT_SUBSET_STATS, StatsSubsetWriter
+
+SAMPLING_DIR = Path(__file__).resolve().parents[1]
+
+BEGIN = "---------- Begin Simulation Statistics ----------\n"
+END = "---------- End Simulation Statistics   ----------\n"
+
+
+def write_dumps(path: Path, dumps: list) -> None:
+    with open(path, "w") as f:
+        for dump in dumps:
+            f.write(BEGIN)
+            for name, value in dump.items():
+                f.write(f"{name} {value} # (Count)\n")
+            f.write(END)
+
+
+def test_simpoint_run_uses_core_counter():
+    # simInsts is 1000000 and then 2000002 because it is not reset, but the
+    # core committed 1000000 instructions in both dumps.
+    run_dir = SAMPLING_DIR / "01-simpoint" / "complete" / "simpoint1-run"
+    samples = read_smarts_samples(
+        run_dir / "stats.txt", "board.processor.cores.core.ipc", 1_000_000
+    )
+    assert samples == [1.029293, 1.286327]
+
+
+def test_end_of_simulation_dump_is_skipped(tmp_path):
+    core = "board.processor.switch.core"
+    dumps = [
+        {
+            "simInsts": 1000 * (i + 1) * 50,
+            f"{core}.commitStats0.numInsts": 1000 + i,
+            f"{core}.ipc": 1.0 + i / 10,
+        }
+        for i in range(3)
+    ]
+    # The detailed core is switched out, so the last dump repeats its stats.
+    dumps.append(dict(dumps[-1], simInsts=9115640))
+    write_dumps(tmp_path / "stats.txt", dumps)
+    samples = read_smarts_samples(tmp_path / "stats.txt", f"{core}.ipc", 1000)
+    assert samples == [1.0, 1.1, 1.2]
+
+
+def test_default_stats_subset_has_the_samples(tmp_path, monkeypatch):
+    core = "board.processor.switch.core"
+    stats = {
+        "simInsts": 0,
+        f"{core}.commitStats0.numInsts": 0,
+        f"{core}.ipc": 0.0,
+        f"{core}.numCycles": 0,
+        "board.cache_hierarchy.l2cache.tags.tagsInUse": 0.0,
+    }
+    # Stand in for the gem5 stats so the writer runs without gem5.
+    monkeypatch.setattr(
+        stats_snapshot,
+        "resolve_stats",
+        lambda patterns: [
+            ([name], name)
+            for name in stats
+            if any(fnmatchcase(name, pattern) for pattern in patterns)
+        ],
+    )
+    monkeypatch.setattr(
+        stats_snapshot,
+        "read_stat_values",
+        lambda resolved: [stats[name] for _, name in resolved],
+    )
+
+    writer = StatsSubsetWriter(
+        tmp_path / "stats-subset.txt", DEFAULT_SUBSET_STATS
+    )
+    for i in range(3):
+        stats["simInsts"] += 50000
+        stats[f"{core}.commitStats0.numInsts"] = 1000 + i
+        stats[f"{core}.ipc"] = 1.0 + i / 4
+        writer.dump()
+    writer.close()
+
+    samples = read_smarts_samples(
+        tmp_path / "stats-subset.txt", f"{core}.ipc", 1000
+    )
+    assert samples == [1.0, 1.25, 1.5]
@@ -0,0 +1,305 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+A streaming reader for the basic block vector (BBV) files of gem5's SimPoint
+probe.
+
+`addSimPointProbe(interval)` writes one line per interval to `simpoint.bb.gz`:
+
+```
+T:<basic block id>:<count> :<basic block id>:<count> ...
+```
+
+Only the basic blocks that ran in an interval are listed, so the file is
+very sparse. A dense `intervals x basic blocks` matrix of a long workload
+does not fit in memory, while the non-zero counts do. `read_bbv` streams the
+file and builds a compressed sparse row (CSR) matrix out of plain NumPy
+arrays, growing them in chunks so memory stays proportional to the number of
+non-zero counts.
+
+Example
+-------
+
+```python
+from util.bbv import read_bbv
+
+bbv = read_bbv("simpoint-analysis-m5out/simpoint.bb.gz")
+print(bbv.get_shape(), bbv.get_nnz())
+for first_row, block in bbv.iter_row_blocks(1024):
+    dense = block.to_dense()
+```
+"""
+
+import gzip
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+# Initial capacity (in non-zero entries) of the buffers of `read_bbv`.
+_INITIAL_CAPACITY = 1 << 16
+
+
+class _GrowableArray:
+    """
+    A 1-D NumPy array that can be appended to. The capacity doubles when it
+    is full so appending is amortized O(1) per element.
+    """
+
+    def __init__(self, dtype, capacity: int = _INITIAL_CAPACITY):
+        self._array = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def extend(self, values: np.ndarray) -> None:
+        end = self._size + len(values)
+        if end > len(self._array):
+            capacity = max(end, 2 * len(self._array))
+            grown = np.empty(capacity, dtype=self._array.dtype)
+            grown[: self._size] = self._array[: self._size]
+            self._array = grown
+        self._array[self._size : end] = values
+        self._size = end
+
+    def append(self, value) -> None:
+        self.extend(np.array([value], dtype=self._array.dtype))
+
+    def finish(self) -> np.ndarray:
+        """
+        The appended values as an array without the unused capacity.
+        """
+        return self._array[: self._size].copy()
+
+
+class BBVMatrix:
+    """
+    A sparse `intervals x basic blocks` matrix in CSR form.
+
+    The counts of row `i` are `data[indptr[i]:indptr[i + 1]]` and their
+    columns are `indices[indptr[i]:indptr[i + 1]]`. Column `j` is basic block
+    `block_ids[j]`.
+    """
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        indices: np.ndarray,
+        indptr: np.ndarray,
+        block_ids: np.ndarray,
+    ):
+        if len(indptr) == 0 or indptr[-1] != len(data):
+            raise ValueError("indptr does not match the number of entries.")
+        if len(indices) != len(data):
+            raise ValueError("data and indices have different lengths.")
+        self.data = data
+        self.indices = indices
+        self.indptr = indptr
+        self.block_ids = block_ids
+
+    def get_shape(self) -> Tuple[int, int]:
+        return len(self.indptr) - 1, len(self.block_ids)
+
+    def get_nnz(self) -> int:
+        return len(self.data)
+
+    def row_sums(self) -> np.ndarray:
+        # Sum through a cumulative sum so that empty rows are handled too.
+        totals = np.concatenate(([0], np.cumsum(self.data, dtype=float)))
+        return totals[self.indptr[1:]] - totals[self.indptr[:-1]]
+
+    def _row_of_entries(self) -> np.ndarray:
+        return np.repeat(
+            np.arange(self.get_shape()[0]), np.diff(self.indptr)
+        )
+
+    def column_sums(self) -> np.ndarray:
+        """
+        The total count of every basic block over all intervals.
+        """
+        return np.bincount(
+            self.indices, weights=self.data, minlength=self.get_shape()[1]
+        )
+
+    def normalized(self) -> "BBVMatrix":
+        """
+        A copy with every row scaled to sum to 1. Empty rows stay empty.
+        """
+        sums = self.row_sums()[self._row_of_entries()]
+        return BBVMatrix(
+            self.data / sums, self.indices, self.indptr, self.block_ids
+        )
+
+    def get_rows(self, start: int, stop: int) -> "BBVMatrix":
+        """
+        Rows `[start, stop)` as a matrix with the same columns. The arrays
+        are views, not copies.
+        """
+        begin, end = self.indptr[start], self.indptr[stop]
+        return BBVMatrix(
+            self.data[begin:end],
+            self.indices[begin:end],
+            self.indptr[start : stop + 1] - begin,
+            self.block_ids,
+        )
+
+    def iter_row_blocks(
+        self, rows_per_block: int
+    ) -> Iterator[Tuple[int, "BBVMatrix"]]:
+        """
+        Yield `(first row, block)` for consecutive blocks of rows.
+        """
+        num_rows = self.get_shape()[0]
+        for start in range(0, num_rows, rows_per_block):
+            yield start, self.get_rows(
+                start, min(start + rows_per_block, num_rows)
+            )
+
+    def dot(
+        self, dense: np.ndarray, rows_per_block: int = 4096
+    ) -> np.ndarray:
+        """
+        The product of this matrix with a dense `basic blocks x n` matrix.
+
+        The rows are multiplied in blocks so the temporary memory is bounded
+        by the number of non-zeros in `rows_per_block` rows.
+        """
+        result = np.zeros((self.get_shape()[0], dense.shape[1]))
+        for start, block in self.iter_row_blocks(rows_per_block):
+            products = block.data[:, np.newaxis] * dense[block.indices]
+            totals = np.concatenate(
+                (np.zeros((1, dense.shape[1])), np.cumsum(products, axis=0))
+            )
+            result[start : start + len(block.indptr) - 1] = (
+                totals[block.indptr[1:]] - totals[block.indptr[:-1]]
+            )
+        return result
+
+    def to_dense(self) -> np.ndarray:
+        dense = np.zeros(self.get_shape())
+        dense[self._row_of_entries(), self.indices] = self.data
+        return dense
+
+
+def coarsen(bbv: BBVMatrix, factor: int) -> BBVMatrix:
+    """
+    Merge every `factor` consecutive intervals into one by adding their
+    counts, as if the profile had been taken with `factor` times the
+    interval size. The last interval may merge fewer intervals.
+    """
+    if factor < 1:
+        raise ValueError(f"factor must be at least 1, not {factor}.")
+    num_rows, num_columns = bbv.get_shape()
+    num_coarse_rows = -(-num_rows // factor)
+    coarse_rows = bbv._row_of_entries() // factor
+    # Entries are sorted by coarse row, so sorting the (row, column) keys
+    # keeps them in CSR order and puts repeated columns next to each other.
+    keys, inverse = np.unique(
+        coarse_rows * num_columns + bbv.indices, return_inverse=True
+    )
+    data = np.bincount(inverse.ravel(), weights=bbv.data).astype(
+        bbv.data.dtype
+    )
+    indptr = np.searchsorted(
+        keys // num_columns, np.arange(num_coarse_rows + 1)
+    )
+    return BBVMatrix(
+        data,
+        (keys % num_columns).astype(bbv.indices.dtype),
+        indptr,
+        bbv.block_ids,
+    )
+
+
+def read_bbv(
+    bbv_file: Union[str, Path], max_intervals: Optional[int] = None
+) -> BBVMatrix:
+    """
+    Read a BBV file (gzipped or not) into a `BBVMatrix`.
+
+    The file is read one line at a time. The basic block ids are stored as
+    they are while reading and then mapped to consecutive columns in the
+    order of their ids, so no column is empty.
+
+    :param max_intervals: Stop after this many intervals.
+    """
+    path = Path(bbv_file)
+    opener = gzip.open if path.suffix == ".gz" else open
+    counts = _GrowableArray(np.int64)
+    blocks = _GrowableArray(np.int64)
+    indptr = _GrowableArray(np.int64, capacity=1024)
+    indptr.append(0)
+    num_rows = 0
+    nnz = 0
+    with opener(path, "rt") as f:
+        for line in f:
+            if not line.startswith("T"):
+                continue
+            if max_intervals is not None and num_rows == max_intervals:
+                break
+            # ":12:3 :40:1" -> [12, 3, 40, 1]
+            entries = np.array(
+                line[1:].replace(":", " ").split(), dtype=np.int64
+            )
+            blocks.extend(entries[0::2])
+            counts.extend(entries[1::2])
+            nnz += len(entries) // 2
+            indptr.append(nnz)
+            num_rows += 1
+
+    return _build_matrix(counts, blocks, indptr)
+
+
+def bbv_from_counts(rows: Iterable[Dict[int, int]]) -> BBVMatrix:
+    """
+    Build a `BBVMatrix` from one `{basic block id: count}` dictionary per
+    interval, e.g., the global BBVs of a `LooppointAnalysisManager`.
+    """
+    counts = _GrowableArray(np.int64)
+    blocks = _GrowableArray(np.int64)
+    indptr = _GrowableArray(np.int64, capacity=1024)
+    indptr.append(0)
+    nnz = 0
+    for row in rows:
+        blocks.extend(np.fromiter(row.keys(), dtype=np.int64, count=len(row)))
+        counts.extend(
+            np.fromiter(row.values(), dtype=np.int64, count=len(row))
+        )
+        nnz += len(row)
+        indptr.append(nnz)
+    return _build_matrix(counts, blocks, indptr)
+
+
+def _build_matrix(
+    counts: _GrowableArray, blocks: _GrowableArray, indptr: _GrowableArray
+) -> BBVMatrix:
+    # Map the basic block ids to consecutive columns.
+    block_ids, indices = np.unique(blocks.finish(), return_inverse=True)
+    return BBVMatrix(
+        counts.finish(),
+        indices.astype(np.int32 if len(block_ids) < 2**31 else np.int64),
+        indptr.finish(),
+        block_ids,
+    )
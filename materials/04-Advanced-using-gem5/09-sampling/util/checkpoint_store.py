@@ -0,0 +1,451 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+A content-addressed store that deduplicates gem5 checkpoints.
+
+Every gem5 checkpoint has a full (gzipped) image of the simulated memory,
+e.g., `board.physmem.store0.pmem`. The SimPoint checkpoints of one program
+(or the checkpoints of several runs of the same disk image) share most of
+their pages, and most of the pages of a big memory are never touched and are
+all zeros.
+
+`CheckpointStore` splits every file of a checkpoint into fixed size chunks
+(4 KiB pages by default, after decompressing memory images) and keeps
+- every distinct non-zero chunk once, compressed, in `chunks.pack`,
+- the offset of every chunk in `chunks.pack` indexed by its SHA-256 hash in
+the `index.sqlite` database, and
+- for every checkpoint, a manifest directory with `manifest.json` (the
+files and their sizes) and one `<file>.chunks.npy` array per file with the
+id of each chunk (0 for zero pages, which are not stored at all).
+
+`restore` writes a normal checkpoint directory back from the store, so gem5
+can restore it as usual.
+
+Chunks are only ever appended to `chunks.pack`. Removing or replacing a
+checkpoint only drops its manifest, so `gc` has to be run to rewrite the
+pack without the chunks no checkpoint uses anymore.
+
+Usage
+-----
+
+```sh
+python3 -m util.checkpoint_store add store \
+    01-simpoint/simpoint-checkpoint/cpt.SimPoint*
+python3 -m util.checkpoint_store list store
+python3 -m util.checkpoint_store restore store cpt.SimPoint0 \
+    restored/cpt.SimPoint0
+python3 -m util.checkpoint_store remove store cpt.SimPoint0
+python3 -m util.checkpoint_store gc store
+```
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 4096
+
+PACK_FILE_NAME = "chunks.pack"
+INDEX_FILE_NAME = "index.sqlite"
+MANIFESTS_DIR_NAME = "manifests"
+MANIFEST_FILE_NAME = "manifest.json"
+
+# Chunk id of a chunk that is all zeros.
+ZERO_CHUNK = 0
+
+# Number of chunks read and looked up at a time.
+_BATCH_CHUNKS = 1024
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    hash BLOB NOT NULL UNIQUE,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+"""
+
+
+def _is_gzipped(path: Path) -> bool:
+    with open(path, "rb") as f:
+        return f.read(2) == _GZIP_MAGIC
+
+
+class CheckpointStore:
+    """
+    A directory with deduplicated checkpoints.
+    """
+
+    def __init__(
+        self,
+        store_dir: Union[str, Path],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        """
+        :param store_dir: The directory of the store. It is created if it
+        does not exist.
+        :param chunk_size: Size of the chunks in bytes. It has to be a
+        multiple of 8 and only applies to checkpoints added from now on.
+        """
+        if chunk_size % 8 != 0:
+            raise ValueError("chunk_size must be a multiple of 8.")
+        self._dir = Path(store_dir)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        (self._dir / MANIFESTS_DIR_NAME).mkdir(exist_ok=True)
+        self._chunk_size = chunk_size
+        self._connection = sqlite3.connect(self._dir / INDEX_FILE_NAME)
+        self._connection.executescript(SCHEMA)
+        self._pack = open(self._dir / PACK_FILE_NAME, "a+b")
+
+    def close(self) -> None:
+        self._pack.close()
+        self._connection.close()
+
+    def __enter__(self) -> "CheckpointStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _get_manifest_dir(self, name: str) -> Path:
+        return self._dir / MANIFESTS_DIR_NAME / name
+
+    def get_names(self) -> List[str]:
+        return sorted(
+            path.name
+            for path in (self._dir / MANIFESTS_DIR_NAME).iterdir()
+            if (path / MANIFEST_FILE_NAME).is_file()
+        )
+
+    def get_manifest(self, name: str) -> Dict:
+        manifest_file = self._get_manifest_dir(name) / MANIFEST_FILE_NAME
+        if not manifest_file.is_file():
+            raise KeyError(f"There is no checkpoint named {name}.")
+        with open(manifest_file, "r") as f:
+            return json.load(f)
+
+    def _store_chunks(self, chunks: List[bytes]) -> List[int]:
+        """
+        Store the chunks that are not in the store yet.
+
+        :returns: The id of every chunk.
+        """
+        hashes = [hashlib.sha256(chunk).digest() for chunk in chunks]
+        known = {}
+        unique_hashes = list(set(hashes))
+        # SQLite limits the number of parameters of a statement.
+        for start in range(0, len(unique_hashes), 500):
+            batch = unique_hashes[start : start + 500]
+            rows = self._connection.execute(
+                "SELECT hash, id FROM chunks WHERE hash IN "
+                f"({', '.join('?' * len(batch))})",
+                batch,
+            )
+            known.update(rows)
+
+        ids = []
+        self._pack.seek(0, 2)
+        for chunk_hash, chunk in zip(hashes, chunks):
+            if not chunk_hash in known:
+                compressed = zlib.compress(chunk, 1)
+                offset = self._pack.tell()
+                self._pack.write(compressed)
+                cursor = self._connection.execute(
+                    "INSERT INTO chunks (hash, offset, length) "
+                    "VALUES (?, ?, ?)",
+                    (chunk_hash, offset, len(compressed)),
+                )
+                known[chunk_hash] = cursor.lastrowid
+            ids.append(known[chunk_hash])
+        return ids
+
+    def _add_file(self, path: Path, manifest_dir: Path) -> Dict:
+        gzipped = _is_gzipped(path)
+        opener = gzip.open if gzipped else open
+        chunk_ids = []
+        size = 0
+        with opener(path, "rb") as f:
+            while True:
+                data = f.read(self._chunk_size * _BATCH_CHUNKS)
+                if not data:
+                    break
+                size += len(data)
+                # Pad the last chunk with zeros; the size in the manifest
+                # says where the file ends.
+                padding = -len(data) % self._chunk_size
+                words = np.frombuffer(data + bytes(padding), dtype=np.uint64)
+                non_zero = words.reshape(-1, self._chunk_size // 8).any(
+                    axis=1
+                )
+                batch_ids = np.full(len(non_zero), ZERO_CHUNK, dtype=np.int64)
+                chunks = [
+                    data[start : start + self._chunk_size]
+                    for start in np.flatnonzero(non_zero) * self._chunk_size
+                ]
+                batch_ids[non_zero] = self._store_chunks(chunks)
+                chunk_ids.append(batch_ids)
+
+        ids = np.concatenate(chunk_ids) if chunk_ids else np.zeros(0, int)
+        np.save(manifest_dir / f"{path.name}.chunks.npy", ids)
+        return {
+            "size": size,
+            "gzip": gzipped,
+            "num_chunks": len(ids),
+            "num_zero_chunks": int((ids == ZERO_CHUNK).sum()),
+        }
+
+    def add(
+        self, checkpoint_dir: Union[str, Path], name: Optional[str] = None
+    ) -> str:
+        """
+        Add a checkpoint directory to the store.
+
+        :param name: The name of the checkpoint in the store. Defaults to the
+        name of the directory. An existing checkpoint with the same name is
+        replaced; the chunks only it used stay in the pack until `gc`.
+        :returns: The name of the checkpoint.
+        """
+        checkpoint_dir = Path(checkpoint_dir)
+        if not (checkpoint_dir / "m5.cpt").is_file():
+            raise FileNotFoundError(f"{checkpoint_dir} is not a checkpoint.")
+        name = name or checkpoint_dir.name
+        manifest_dir = self._get_manifest_dir(name)
+        if manifest_dir.exists():
+            shutil.rmtree(manifest_dir)
+        manifest_dir.mkdir(parents=True)
+
+        files = {}
+        for path in sorted(checkpoint_dir.iterdir()):
+            if path.is_file():
+                files[path.name] = self._add_file(path, manifest_dir)
+        self._pack.flush()
+        self._connection.commit()
+
+        with open(manifest_dir / MANIFEST_FILE_NAME, "w") as f:
+            json.dump(
+                {"chunk_size": self._chunk_size, "files": files}, f, indent=2
+            )
+        return name
+
+    def _read_chunks(self, ids: np.ndarray) -> Dict[int, bytes]:
+        unique_ids = [int(i) for i in np.unique(ids) if i != ZERO_CHUNK]
+        chunks = {}
+        for start in range(0, len(unique_ids), 500):
+            batch = unique_ids[start : start + 500]
+            rows = self._connection.execute(
+                "SELECT id, offset, length FROM chunks WHERE id IN "
+                f"({', '.join('?' * len(batch))})",
+                batch,
+            )
+            for chunk_id, offset, length in rows:
+                self._pack.seek(offset)
+                chunks[chunk_id] = zlib.decompress(self._pack.read(length))
+        return chunks
+
+    def restore(self, name: str, target_dir: Union[str, Path]) -> Path:
+        """
+        Write the checkpoint `name` to `target_dir` as a normal checkpoint
+        directory. Memory images that were gzipped are gzipped again.
+        """
+        manifest = self.get_manifest(name)
+        chunk_size = manifest["chunk_size"]
+        zero_chunk = bytes(chunk_size)
+        manifest_dir = self._get_manifest_dir(name)
+        target_dir = Path(target_dir)
+        target_dir.mkdir(parents=True, exist_ok=True)
+
+        for file_name, info in manifest["files"].items():
+            ids = np.load(manifest_dir / f"{file_name}.chunks.npy")
+            if info["gzip"]:
+                f = gzip.open(target_dir / file_name, "wb", compresslevel=1)
+            else:
+                f = open(target_dir / file_name, "wb")
+            with f:
+                remaining = info["size"]
+                for start in range(0, len(ids), _BATCH_CHUNKS):
+                    batch = ids[start : start + _BATCH_CHUNKS]
+                    chunks = self._read_chunks(batch)
+                    for chunk_id in batch:
+                        chunk = chunks.get(int(chunk_id), zero_chunk)
+                        f.write(chunk[: min(chunk_size, remaining)])
+                        remaining -= chunk_size
+        return target_dir
+
+    def remove(self, name: str) -> None:
+        """
+        Remove the checkpoint `name`. Its chunks stay in the pack until
+        `gc`.
+        """
+        manifest_dir = self._get_manifest_dir(name)
+        if not (manifest_dir / MANIFEST_FILE_NAME).is_file():
+            raise KeyError(f"There is no checkpoint named {name}.")
+        shutil.rmtree(manifest_dir)
+
+    def _get_referenced_ids(self) -> np.ndarray:
+        referenced = np.zeros(0, dtype=np.int64)
+        for name in self.get_names():
+            manifest_dir = self._get_manifest_dir(name)
+            for file_name in self.get_manifest(name)["files"]:
+                ids = np.load(manifest_dir / f"{file_name}.chunks.npy")
+                referenced = np.union1d(referenced, ids)
+        return referenced[referenced != ZERO_CHUNK]
+
+    def gc(self) -> int:
+        """
+        Drop the chunks that no checkpoint uses anymore and rewrite the pack
+        with only the others. The ids of the kept chunks do not change, so
+        the manifests stay valid. The store must not be used by another
+        process while this runs.
+
+        :returns: The number of bytes freed in the pack.
+        """
+        referenced = set(int(i) for i in self._get_referenced_ids())
+        rows = self._connection.execute(
+            "SELECT id, offset, length FROM chunks ORDER BY offset"
+        ).fetchall()
+        pack_file = self._dir / PACK_FILE_NAME
+        new_pack_file = self._dir / f"{PACK_FILE_NAME}.gc"
+        old_size = pack_file.stat().st_size
+
+        kept = []
+        with open(new_pack_file, "wb") as new_pack:
+            for chunk_id, offset, length in rows:
+                if not chunk_id in referenced:
+                    continue
+                self._pack.seek(offset)
+                kept.append((new_pack.tell(), chunk_id))
+                new_pack.write(self._pack.read(length))
+            new_pack.flush()
+            os.fsync(new_pack.fileno())
+
+        kept_ids = [(chunk_id,) for _, chunk_id in kept]
+        with self._connection:
+            self._connection.execute(
+                "CREATE TEMP TABLE kept (id INTEGER PRIMARY KEY)"
+            )
+            self._connection.executemany(
+                "INSERT INTO kept (id) VALUES (?)", kept_ids
+            )
+            self._connection.execute(
+                "DELETE FROM chunks WHERE id NOT IN (SELECT id FROM kept)"
+            )
+            self._connection.execute("DROP TABLE kept")
+            self._connection.executemany(
+                "UPDATE chunks SET offset = ? WHERE id = ?", kept
+            )
+        self._pack.close()
+        os.replace(new_pack_file, pack_file)
+        self._pack = open(pack_file, "a+b")
+        return old_size - pack_file.stat().st_size
+
+    def get_usage(self) -> Tuple[int, int]:
+        """
+        :returns: The total uncompressed size of the checkpoints in the store
+        and the number of bytes the store uses for them.
+        """
+        logical = sum(
+            info["size"]
+            for name in self.get_names()
+            for info in self.get_manifest(name)["files"].values()
+        )
+        stored = (self._dir / PACK_FILE_NAME).stat().st_size
+        stored += (self._dir / INDEX_FILE_NAME).stat().st_size
+        for path in (self._dir / MANIFESTS_DIR_NAME).rglob("*"):
+            if path.is_file():
+                stored += path.stat().st_size
+        return logical, stored
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Store gem5 checkpoints with deduplicated chunks."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="Add checkpoints.")
+    add_parser.add_argument("store", type=str)
+    add_parser.add_argument("checkpoints", type=str, nargs="+")
+    add_parser.add_argument(
+        "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE
+    )
+
+    restore_parser = subparsers.add_parser(
+        "restore", help="Write a checkpoint back to a directory."
+    )
+    restore_parser.add_argument("store", type=str)
+    restore_parser.add_argument("name", type=str)
+    restore_parser.add_argument("target", type=str)
+
+    list_parser = subparsers.add_parser("list", help="List the checkpoints.")
+    list_parser.add_argument("store", type=str)
+
+    remove_parser = subparsers.add_parser(
+        "remove", help="Remove checkpoints (run gc to free their chunks)."
+    )
+    remove_parser.add_argument("store", type=str)
+    remove_parser.add_argument("names", type=str, nargs="+")
+
+    gc_parser = subparsers.add_parser(
+        "gc", help="Drop the chunks no checkpoint uses anymore."
+    )
+    gc_parser.add_argument("store", type=str)
+
+    args = parser.parse_args()
+
+    if args.command == "add":
+        with CheckpointStore(args.store, args.chunk_size) as store:
+            for checkpoint in args.checkpoints:
+                print(f"Added {store.add(checkpoint)}")
+    elif args.command == "restore":
+        with CheckpointStore(args.store) as store:
+            store.restore(args.name, args.target)
+            print(f"Restored {args.name} to {args.target}")
+    elif args.command == "remove":
+        with CheckpointStore(args.store) as store:
+            for name in args.names:
+                store.remove(name)
+                print(f"Removed {name}")
+    elif args.command == "gc":
+        with CheckpointStore(args.store) as store:
+            print(f"Freed {store.gc()} bytes")
+    else:
+        with CheckpointStore(args.store) as store:
+            for name in store.get_names():
+                print(name)
+            logical, stored = store.get_usage()
+            print(f"{logical} bytes of checkpoints in {stored} bytes")
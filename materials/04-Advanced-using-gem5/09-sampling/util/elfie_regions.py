@@ -0,0 +1,176 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Lists of ELFie (or LoopPoint) regions and their weights.
+
+A region starts and ends when a PC has been executed a given number of times
+(see `gem5.resources.elfie.ELFieInfo`). The regions of a workload are
+written as a JSON file:
+
+```json
+{
+    "regions": [
+        {
+            "name": "1",
+            "start": {"pc": "0x100b643", "count": 1},
+            "end": {"pc": "0x526730", "count": 297879},
+            "weight": 0.25,
+            "workload": "wrf-s.1_globalr13"
+        }
+    ]
+}
+```
+
+Every ELFie is a separate binary that holds only its own region, so every
+region of an ELFie workload names the gem5 resource (`workload`) or the local
+file (`binary`) of its ELFie. Regions picked from the full program (see
+02-elfies/looppoint-regions.py) leave both out and all run on the binary
+given to run-elfies.py with `--binary`.
+
+`run-elfies.py --regions=<file> --region=<name>` runs one of the regions,
+`run-elfie-regions.py` runs all of them in parallel, and `weighted_estimate`
+combines the stats of the regions into a whole-program estimate the same
+way SimPoint weights are used.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+
+class Region:
+    """
+    A region between two (PC, count) markers and its weight.
+
+    :param workload: The gem5 resource of the ELFie holding the region.
+    :param binary: The path to the ELFie holding the region.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        start_pc: int,
+        start_count: int,
+        end_pc: int,
+        end_count: int,
+        weight: float,
+        workload: Optional[str] = None,
+        binary: Optional[str] = None,
+    ):
+        self.name = name
+        self.start_pc = start_pc
+        self.start_count = start_count
+        self.end_pc = end_pc
+        self.end_count = end_count
+        self.weight = weight
+        self.workload = workload
+        self.binary = binary
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Region":
+        return cls(
+            name=str(data["name"]),
+            start_pc=_parse_pc(data["start"]["pc"]),
+            start_count=int(data["start"]["count"]),
+            end_pc=_parse_pc(data["end"]["pc"]),
+            end_count=int(data["end"]["count"]),
+            weight=float(data.get("weight", 1.0)),
+            workload=data.get("workload"),
+            binary=data.get("binary"),
+        )
+
+    def to_dict(self) -> Dict:
+        data = {
+            "name": self.name,
+            "start": {"pc": hex(self.start_pc), "count": self.start_count},
+            "end": {"pc": hex(self.end_pc), "count": self.end_count},
+            "weight": self.weight,
+        }
+        if self.workload is not None:
+            data["workload"] = self.workload
+        if self.binary is not None:
+            data["binary"] = self.binary
+        return data
+
+    def __repr__(self) -> str:
+        return (
+            f"Region({self.name}: {hex(self.start_pc)}:{self.start_count} -> "
+            f"{hex(self.end_pc)}:{self.end_count}, weight {self.weight})"
+        )
+
+
+def _parse_pc(pc: Union[str, int]) -> int:
+    # PCs are usually written in hex ("0x100b643") but can be plain numbers.
+    return pc if isinstance(pc, int) else int(pc, 0)
+
+
+def read_regions(regions_file: Union[str, Path]) -> List[Region]:
+    with open(regions_file, "r") as f:
+        return [Region.from_dict(region) for region in json.load(f)["regions"]]
+
+
+def write_regions(
+    regions: Iterable[Region], regions_file: Union[str, Path]
+) -> None:
+    with open(regions_file, "w") as f:
+        json.dump(
+            {"regions": [region.to_dict() for region in regions]}, f, indent=4
+        )
+
+
+def find_region(regions: Iterable[Region], name: str) -> Region:
+    for region in regions:
+        if region.name == name:
+            return region
+    raise ValueError(f"Could not find the region {name}.")
+
+
+def weighted_estimate(
+    regions: List[Region], region_stats: List[Dict[str, float]]
+) -> Dict[str, float]:
+    """
+    Combine the stats of every region weighted by the region weights. The
+    weights are normalized so they sum to 1. Only the stats every region has
+    are estimated.
+
+    :param region_stats: The stats of each region, in the order of
+    `regions`.
+    """
+    total_weight = sum(region.weight for region in regions)
+    if total_weight <= 0:
+        raise ValueError("The region weights do not sum to a positive value.")
+    names = set(region_stats[0]) if region_stats else set()
+    for stats in region_stats[1:]:
+        names &= set(stats)
+    return {
+        name: sum(
+            region.weight * stats[name]
+            for region, stats in zip(regions, region_stats)
+        )
+        / total_weight
+        for name in sorted(names)
+    }
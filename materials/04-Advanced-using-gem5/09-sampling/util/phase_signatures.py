@@ -0,0 +1,195 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Online phase detection with random-projected BBV signatures.
+
+SimPoint finds phases offline by clustering the BBVs of all intervals at
+once. `PhaseSignatureCache` instead classifies every interval as soon as it
+ends, so the simulation can decide right away whether the next interval
+needs the detailed core.
+
+The BBV of an interval is scaled to unit length and projected onto a few
+Gaussian random directions. Scaled by `1 / sqrt(dimensions)`, the projection
+keeps Euclidean distances approximately (Johnson-Lindenstrauss), so the
+distance between two signatures is close to the distance between the unit
+BBVs: 0 for the same basic blocks in the same proportions and `sqrt(2)` for
+no basic blocks in common. An interval whose signature is within
+`threshold` of a known phase belongs to it; otherwise it starts a new phase.
+
+The random direction of a basic block only depends on the seed and the
+basic block id, so blocks can be added as they show up.
+
+Reference: Sherwood et al., "Phase Tracking and Prediction", ISCA 2003.
+"""
+
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SIGNATURE_SEED = 1311035209
+SIGNATURE_DIMENSIONS = 16
+PHASE_THRESHOLD = 0.4
+
+
+class Phase:
+    """
+    A phase: the mean signature of its intervals and its measured CPI.
+    """
+
+    def __init__(self, phase_id: int, signature: np.ndarray):
+        self.phase_id = phase_id
+        self.signature = signature
+        self.num_intervals = 0
+        self.instructions = 0
+        # The (CPI, instructions) of every interval of the phase run with the
+        # detailed core.
+        self.cpi_samples = []
+
+    def add_interval(self, signature: np.ndarray, instructions: int) -> None:
+        self.num_intervals += 1
+        self.instructions += instructions
+        # Move the signature to the mean of the intervals of the phase.
+        self.signature = (
+            self.signature + (signature - self.signature) / self.num_intervals
+        )
+
+    def add_cpi(self, cpi: float, instructions: int) -> None:
+        self.cpi_samples.append((cpi, instructions))
+
+    def is_measured(self) -> bool:
+        return len(self.cpi_samples) > 0
+
+    @property
+    def cpi(self) -> float:
+        # A short interval, e.g., the last one of the program, counts less
+        # than a full one.
+        instructions = sum(count for _, count in self.cpi_samples)
+        return (
+            sum(cpi * count for cpi, count in self.cpi_samples) / instructions
+        )
+
+
+class PhaseSignatureCache:
+    """
+    The phases seen so far and the phase of every interval.
+    """
+
+    def __init__(
+        self,
+        dimensions: int = SIGNATURE_DIMENSIONS,
+        threshold: float = PHASE_THRESHOLD,
+        seed: int = SIGNATURE_SEED,
+    ):
+        """
+        :param dimensions: The number of dimensions of the signatures.
+        :param threshold: The largest distance between the signature of an
+        interval and a phase for the interval to belong to the phase.
+        :param seed: The seed of the random directions.
+        """
+        self.dimensions = dimensions
+        self.threshold = threshold
+        self.seed = seed
+        self.phases: List[Phase] = []
+        # (instructions, phase id) of every interval.
+        self.intervals: List[Tuple[int, int]] = []
+        self._directions: Dict[int, np.ndarray] = {}
+
+    def _direction(self, block: int) -> np.ndarray:
+        direction = self._directions.get(block)
+        if direction is None:
+            rng = np.random.default_rng([self.seed, block])
+            direction = rng.standard_normal(self.dimensions)
+            direction /= math.sqrt(self.dimensions)
+            self._directions[block] = direction
+        return direction
+
+    def signature(self, bbv: Dict[int, float]) -> np.ndarray:
+        """
+        The signature of a BBV given as `{basic block id: count}`.
+        """
+        signature = np.zeros(self.dimensions)
+        norm = math.sqrt(sum(count * count for count in bbv.values()))
+        if norm == 0:
+            return signature
+        for block, count in bbv.items():
+            signature += (count / norm) * self._direction(block)
+        return signature
+
+    def _nearest(
+        self, signature: np.ndarray, measured_only: bool = False
+    ) -> Tuple[Optional[Phase], float]:
+        nearest, nearest_distance = None, math.inf
+        for phase in self.phases:
+            if measured_only and not phase.is_measured():
+                continue
+            distance = float(np.linalg.norm(signature - phase.signature))
+            if distance < nearest_distance:
+                nearest, nearest_distance = phase, distance
+        return nearest, nearest_distance
+
+    def classify(
+        self, bbv: Dict[int, float], instructions: int
+    ) -> Tuple[Phase, bool]:
+        """
+        Add an interval and find its phase.
+
+        :returns: The phase of the interval and whether the phase is new.
+        """
+        signature = self.signature(bbv)
+        phase, distance = self._nearest(signature)
+        is_new = phase is None or distance > self.threshold
+        if is_new:
+            phase = Phase(len(self.phases), signature)
+            self.phases.append(phase)
+        phase.add_interval(signature, instructions)
+        self.intervals.append((instructions, phase.phase_id))
+        return phase, is_new
+
+    def estimated_cpi(self) -> float:
+        """
+        The CPI of the whole program: the CPI of the phase of every interval
+        weighted by the instructions of the interval.
+
+        Phases that never ran with the detailed core use the CPI of the
+        closest measured phase.
+        """
+        measured = [phase for phase in self.phases if phase.is_measured()]
+        if not measured:
+            raise ValueError("No phase has been measured.")
+        cpis = {}
+        for phase in self.phases:
+            if phase.is_measured():
+                cpis[phase.phase_id] = phase.cpi
+            else:
+                closest, _ = self._nearest(phase.signature, True)
+                cpis[phase.phase_id] = closest.cpi
+        cycles = sum(
+            instructions * cpis[phase_id]
+            for instructions, phase_id in self.intervals
+        )
+        return cycles / sum(instructions for instructions, _ in self.intervals)
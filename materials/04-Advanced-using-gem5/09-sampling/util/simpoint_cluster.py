@@ -0,0 +1,314 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+SimPoint clustering of basic block vectors with NumPy.
+
+This follows what the SimPoint 3.2 tool does with the `simpoint.bb.gz` file
+written by `addSimPointProbe`:
+
+1. Every interval's basic block vector (BBV) is normalized so it sums to 1.
+2. The BBVs are randomly projected down to a few (15) dimensions. The BBVs
+are kept sparse (see util/bbv.py) until they are projected.
+3. k-means with k-means++ initialization is run for every k in a range.
+4. The clustering with the smallest k whose Bayesian information criterion
+(BIC) score is at least 90% of the way from the worst to the best score is
+picked.
+5. The interval closest to the center of every cluster is the SimPoint of
+that cluster, and its weight is the fraction of intervals in the cluster.
+
+The clusterings for different values of k are independent, so they are run
+in parallel with one process per k.
+
+Reference: Hamerly et al., "SimPoint 3.0: Faster and More Flexible Program
+Phase Analysis", JILP 2005.
+"""
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .bbv import BBVMatrix, read_bbv
+
+# The default seeds of the SimPoint 3.2 tool.
+PROJECTION_SEED = 2042712918
+KMEANS_SEED = 493575226
+
+PROJECTED_DIMENSIONS = 15
+BIC_THRESHOLD = 0.9
+
+
+def normalize(bbv: BBVMatrix) -> BBVMatrix:
+    """
+    Scale every interval so its counts sum to 1. Empty intervals stay empty.
+    """
+    return bbv.normalized()
+
+
+def random_projection(
+    bbv: BBVMatrix,
+    dimensions: int = PROJECTED_DIMENSIONS,
+    seed: int = PROJECTION_SEED,
+    rows_per_block: int = 4096,
+) -> np.ndarray:
+    """
+    Project the intervals of `bbv` onto `dimensions` random directions with
+    coordinates drawn uniformly from [-1, 1], like SimPoint does.
+
+    The sparse BBVs are projected `rows_per_block` intervals at a time, so
+    the dense BBVs are never built.
+    """
+    rng = np.random.default_rng(seed)
+    projection = rng.uniform(-1.0, 1.0, size=(bbv.get_shape()[1], dimensions))
+    return bbv.dot(projection, rows_per_block)
+
+
+def _squared_distances(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """
+    The `points x centers` matrix of squared Euclidean distances.
+    """
+    distances = (
+        (points**2).sum(axis=1)[:, np.newaxis]
+        - 2.0 * points @ centers.T
+        + (centers**2).sum(axis=1)[np.newaxis, :]
+    )
+    # Rounding can make the distance of a point to itself slightly negative.
+    return np.maximum(distances, 0.0)
+
+
+def _kmeans_plus_plus(
+    points: np.ndarray, k: int, rng: np.random.Generator
+) -> np.ndarray:
+    centers = [points[rng.integers(len(points))]]
+    closest = _squared_distances(points, np.array(centers))[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        if total == 0:
+            # Every point is already a center.
+            index = rng.integers(len(points))
+        else:
+            index = rng.choice(len(points), p=closest / total)
+        centers.append(points[index])
+        new_distances = _squared_distances(points, points[[index]])[:, 0]
+        closest = np.minimum(closest, new_distances)
+    return np.array(centers)
+
+
+def kmeans(
+    points: np.ndarray,
+    k: int,
+    rng: np.random.Generator,
+    max_iterations: int = 100,
+) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Cluster `points` into (at most) `k` clusters.
+
+    :returns: The centers, the cluster of every point and the sum of squared
+    distances of the points to their centers.
+    """
+    centers = _kmeans_plus_plus(points, k, rng)
+    labels = None
+    for _ in range(max_iterations):
+        new_labels = _squared_distances(points, centers).argmin(axis=1)
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, points)
+        # Empty clusters keep their old center.
+        non_empty = counts > 0
+        centers[non_empty] = sums[non_empty] / counts[non_empty, np.newaxis]
+    distances = _squared_distances(points, centers)
+    error = distances[np.arange(len(points)), labels].sum()
+    return centers, labels, float(error)
+
+
+def bic(points: np.ndarray, labels: np.ndarray, k: int) -> float:
+    """
+    The BIC score of a clustering, using the spherical Gaussian model of
+    Pelleg and Moore's X-means like SimPoint does. Higher is better.
+    """
+    num_points, num_dimensions = points.shape
+    counts = np.bincount(labels, minlength=k)
+    centers = np.zeros((k, num_dimensions))
+    np.add.at(centers, labels, points)
+    non_empty = counts > 0
+    centers[non_empty] /= counts[non_empty, np.newaxis]
+    squared_error = ((points - centers[labels]) ** 2).sum()
+
+    if num_points <= k or squared_error == 0:
+        # Every point is its own cluster; use a tiny variance instead of 0.
+        variance = np.finfo(float).eps
+    else:
+        variance = squared_error / (num_points - k)
+
+    counts = counts[non_empty]
+    log_likelihood = (
+        counts * np.log(counts)
+        - counts * math.log(num_points)
+        - counts / 2.0 * math.log(2.0 * math.pi)
+        - counts * num_dimensions / 2.0 * math.log(variance)
+        - (counts - k) / 2.0
+    ).sum()
+    num_parameters = (k - 1) + num_dimensions * k + 1
+    return float(
+        log_likelihood - num_parameters / 2.0 * math.log(num_points)
+    )
+
+
+def cluster_k(
+    points: np.ndarray, k: int, num_init: int = 5, seed: int = KMEANS_SEED
+) -> Tuple[np.ndarray, float]:
+    """
+    Run k-means `num_init` times with different initial centers and keep the
+    run with the smallest squared error.
+
+    :returns: The cluster of every point and the BIC score.
+    """
+    rng = np.random.default_rng([seed, k])
+    best_labels, best_error = None, math.inf
+    for _ in range(num_init):
+        _, labels, error = kmeans(points, k, rng)
+        if error < best_error:
+            best_labels, best_error = labels, error
+    return best_labels, bic(points, best_labels, k)
+
+
+def pick_k(scores: Dict[int, float], threshold: float = BIC_THRESHOLD) -> int:
+    """
+    The smallest k whose BIC score is at least `threshold` of the way from
+    the lowest to the highest score.
+    """
+    lowest = min(scores.values())
+    highest = max(scores.values())
+    for k in sorted(scores):
+        if scores[k] >= lowest + threshold * (highest - lowest):
+            return k
+    return max(scores)
+
+
+def cluster(
+    points: np.ndarray,
+    max_k: int,
+    min_k: int = 1,
+    num_init: int = 5,
+    seed: int = KMEANS_SEED,
+    threshold: float = BIC_THRESHOLD,
+    max_workers: Optional[int] = None,
+) -> Tuple[int, np.ndarray, Dict[int, float]]:
+    """
+    Cluster `points` for every k in `[min_k, max_k]` in parallel and pick k
+    with the BIC.
+
+    :param max_workers: Maximum number of processes. Defaults to the number
+    of host cores.
+    :returns: The chosen k, the cluster of every point for that k and the BIC
+    score of every k.
+    """
+    ks = list(range(min_k, min(max_k, len(points)) + 1))
+    if not ks:
+        raise ValueError(f"Cannot cluster {len(points)} points into {min_k}.")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(
+            executor.map(
+                cluster_k,
+                [points] * len(ks),
+                ks,
+                [num_init] * len(ks),
+                [seed] * len(ks),
+            )
+        )
+    scores = {k: score for k, (_, score) in zip(ks, results)}
+    k = pick_k(scores, threshold)
+    return k, results[ks.index(k)][0], scores
+
+
+def pick_simpoints(
+    points: np.ndarray, labels: np.ndarray
+) -> List[Tuple[int, int, float]]:
+    """
+    Pick the interval closest to the center of every non-empty cluster.
+
+    :returns: `(interval, cluster, weight)` for every non-empty cluster,
+    sorted by cluster.
+    """
+    simpoints = []
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        center = points[members].mean(axis=0)
+        distances = ((points[members] - center) ** 2).sum(axis=1)
+        simpoints.append(
+            (
+                int(members[distances.argmin()]),
+                int(label),
+                len(members) / len(points),
+            )
+        )
+    return simpoints
+
+
+def simpoint_bbv_error(
+    bbv: BBVMatrix, simpoints: List[Tuple[int, int, float]]
+) -> float:
+    """
+    How far the weighted SimPoints are from the whole program in basic block
+    space.
+
+    The normalized BBVs of the SimPoints are added with their weights and
+    compared to the normalized BBV of the whole program. The result is the
+    total variation distance between the two (half of the L1 distance), so 0
+    means the SimPoints ran the basic blocks in exactly the same proportions
+    as the whole program and 1 means they have nothing in common.
+    """
+    whole_program = bbv.column_sums()
+    whole_program = whole_program / whole_program.sum()
+    normalized = bbv.normalized()
+    estimate = np.zeros_like(whole_program)
+    for interval, _, weight in simpoints:
+        row = normalized.get_rows(interval, interval + 1).to_dense()[0]
+        estimate += weight * row
+    return float(np.abs(estimate - whole_program).sum() / 2.0)
+
+
+def write_simpoints(
+    simpoints: List[Tuple[int, int, float]],
+    simpoint_file: Union[str, Path],
+    weight_file: Union[str, Path],
+) -> None:
+    """
+    Write SimPoints in the format of the SimPoint tool's `-saveSimpoints`
+    and `-saveSimpointWeights` files.
+    """
+    with open(simpoint_file, "w") as f:
+        for interval, label, _ in simpoints:
+            f.write(f"{interval} {label}\n")
+    with open(weight_file, "w") as f:
+        for _, label, weight in simpoints:
+            f.write(f"{weight:g} {label}\n")
@@ -0,0 +1,172 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Weighted whole-program predictions from any number of SimPoints.
+
+`simpoint-run.py --sid=N` writes the stats of SimPoint `N` to
+`simpoint{N}-run/stats.txt`. The second dump in that file is the SimPoint
+interval itself (the first one is the end of the warmup). The prediction for
+the whole program is the sum of every SimPoint's value weighted by the
+weight SimPoint gave its cluster.
+
+run-all-simpoint.py puts the `simpoint{N}-run` directories of a SimPoint set
+in `simpoint_runs_dir(...)`, so the runs of different SimPoint files or
+interval sizes are never mixed up.
+"""
+
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .stats_reader import iter_stat_dumps
+
+_RUN_DIR_PATTERN = re.compile(r"^simpoint(\d+)-run$")
+
+
+def read_simpoints(
+    simpoint_file: Union[str, Path], weight_file: Union[str, Path]
+) -> List[Tuple[int, float]]:
+    """
+    Read the `results.simpts` and `results.weights` files written by SimPoint.
+
+    Each line of both files is `<value> <cluster id>`. The SimPoints are
+    returned as `(interval, weight)` pairs sorted by interval, which is the
+    order `gem5.utils.simpoint.SimPoint` uses. The index of a pair in the list
+    is the `--sid` to pass to `simpoint-run.py`.
+    """
+    intervals = {}
+    with open(simpoint_file, "r") as f:
+        for line in f:
+            if line.strip():
+                interval, cluster = line.split()
+                intervals[int(cluster)] = int(interval)
+    weights = {}
+    with open(weight_file, "r") as f:
+        for line in f:
+            if line.strip():
+                weight, cluster = line.split()
+                weights[int(cluster)] = float(weight)
+    if intervals.keys() != weights.keys():
+        raise ValueError(
+            f"{simpoint_file} and {weight_file} do not have the same clusters."
+        )
+    return sorted(
+        (intervals[cluster], weights[cluster]) for cluster in intervals
+    )
+
+
+def simpoint_runs_dir(
+    checkpoint_dir: Union[str, Path],
+    simpoint_file: Union[str, Path],
+    interval: int,
+) -> Path:
+    """
+    The directory with the `simpoint{N}-run` directories of the SimPoints in
+    `simpoint_file` found with `interval` instructions per interval.
+    """
+    name = f"runs-{Path(simpoint_file).stem}-I{interval}"
+    return Path(checkpoint_dir) / name
+
+
+def find_simpoint_run_dirs(base_dir: Union[str, Path]) -> Dict[int, Path]:
+    """
+    Find all `simpoint{N}-run` directories with a stats file in `base_dir`.
+
+    :returns: A dictionary from SimPoint id to directory.
+    """
+    run_dirs = {}
+    for path in Path(base_dir).iterdir():
+        match = _RUN_DIR_PATTERN.match(path.name)
+        if match and (path / "stats.txt").is_file():
+            run_dirs[int(match.group(1))] = path
+    return run_dirs
+
+
+def read_simpoint_stats(
+    run_dir: Union[str, Path], stat_names: Iterable[str]
+) -> Dict[str, float]:
+    """
+    Read stats from the last dump of a SimPoint run, which is the dump of the
+    SimPoint interval.
+    """
+    last_dump = {}
+    for dump in iter_stat_dumps(Path(run_dir) / "stats.txt", stat_names):
+        last_dump = dump
+    return last_dump
+
+
+def predict(
+    base_dir: Union[str, Path],
+    simpoint_file: Union[str, Path],
+    weight_file: Union[str, Path],
+    stat_names: List[str],
+    max_workers: Optional[int] = None,
+) -> Dict[str, float]:
+    """
+    Predict the whole-program value of stats from the SimPoint runs in
+    `base_dir`.
+
+    The stats files of the SimPoint runs are parsed in parallel, one process
+    per file.
+
+    :param base_dir: Directory with the `simpoint{N}-run` directories.
+    :param simpoint_file: Path to `results.simpts`.
+    :param weight_file: Path to `results.weights`.
+    :param stat_names: Names of the stats to predict.
+    :param max_workers: Maximum number of processes. Defaults to the number
+    of host cores.
+    """
+    simpoints = read_simpoints(simpoint_file, weight_file)
+    run_dirs = find_simpoint_run_dirs(base_dir)
+    missing = [sid for sid in range(len(simpoints)) if not sid in run_dirs]
+    if missing:
+        raise FileNotFoundError(
+            f"Could not find the runs of SimPoints {missing} in {base_dir}."
+        )
+
+    sids = list(range(len(simpoints)))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        all_stats = list(
+            executor.map(
+                read_simpoint_stats,
+                [run_dirs[sid] for sid in sids],
+                [stat_names] * len(sids),
+            )
+        )
+
+    predictions = {}
+    for stat_name in stat_names:
+        predictions[stat_name] = 0.0
+        for sid, stats in zip(sids, all_stats):
+            if not stat_name in stats:
+                raise ValueError(
+                    f"Could not find {stat_name} in "
+                    f"{run_dirs[sid] / 'stats.txt'}"
+                )
+            predictions[stat_name] += stats[stat_name] * simpoints[sid][1]
+    return predictions
@@ -0,0 +1,230 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Statistics for SMARTS-style systematic sampling.
+
+SMARTS estimates a metric (e.g., IPC) of the whole program with the mean of
+the metric over `n` equally spaced samples. By the central limit theorem the
+relative error of that mean is bounded by `z * V / sqrt(n)` with a confidence
+given by `z`, where `V` is the coefficient of variation of the samples. The
+same bound tells us how many samples are needed to reach a target error,
+which is what `SampleEstimate.required_samples` computes.
+
+Reference: Wunderlich et al., "SMARTS: Accelerating Microarchitecture
+Simulation via Rigorous Statistical Sampling", ISCA 2003.
+"""
+
+import math
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .stats_reader import iter_stat_dumps
+
+# z-scores for the confidence levels SMARTS reports.
+Z_95 = 1.96
+Z_99_7 = 3.0
+
+
+class SampleEstimate:
+    """
+    Mean, variance and error bounds of a set of samples.
+    """
+
+    def __init__(self, samples: Iterable[float]):
+        """
+        :param samples: The metric measured in every sample. At least two
+        samples are needed to compute the variance.
+        """
+        samples = np.asarray(list(samples), dtype=np.float64)
+        if samples.size < 2:
+            raise ValueError(
+                f"At least 2 samples are needed, got {samples.size}."
+            )
+        self.num_samples = int(samples.size)
+        self.mean = float(samples.mean())
+        self.variance = float(samples.var(ddof=1))
+        self.std = math.sqrt(self.variance)
+        self.coefficient_of_variation = (
+            self.std / self.mean if self.mean != 0 else math.inf
+        )
+
+    def relative_error(self, z: float = Z_99_7) -> float:
+        """
+        The relative error bound of the mean with the confidence given by `z`.
+        """
+        return z * self.coefficient_of_variation / math.sqrt(self.num_samples)
+
+    def confidence_interval(self, z: float = Z_99_7) -> Tuple[float, float]:
+        """
+        The confidence interval of the mean with the confidence given by `z`.
+        """
+        half_width = z * self.std / math.sqrt(self.num_samples)
+        return (self.mean - half_width, self.mean + half_width)
+
+    def required_samples(
+        self, target_error: float, z: float = Z_99_7
+    ) -> int:
+        """
+        The minimum number of samples needed to get a relative error bound of
+        `target_error` (e.g., 0.03 for 3%) with the confidence given by `z`.
+
+        This assumes the coefficient of variation measured with the current
+        samples is representative of the whole program.
+        """
+        return required_samples(
+            self.coefficient_of_variation, target_error, z
+        )
+
+
+class RunningEstimate:
+    """
+    Mean and variance of samples that arrive one at a time.
+
+    This uses Welford's algorithm so it can be updated from inside an exit
+    event generator after every sample without keeping the samples.
+    """
+
+    def __init__(self):
+        self.num_samples = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, sample: float) -> None:
+        self.num_samples += 1
+        delta = sample - self.mean
+        self.mean += delta / self.num_samples
+        self._m2 += delta * (sample - self.mean)
+
+    @property
+    def variance(self) -> float:
+        if self.num_samples < 2:
+            return math.inf
+        return self._m2 / (self.num_samples - 1)
+
+    @property
+    def coefficient_of_variation(self) -> float:
+        if self.num_samples < 2 or self.mean == 0:
+            return math.inf
+        return math.sqrt(self.variance) / self.mean
+
+    def relative_error(self, z: float = Z_99_7) -> float:
+        if self.num_samples < 2:
+            return math.inf
+        return z * self.coefficient_of_variation / math.sqrt(self.num_samples)
+
+    def is_converged(
+        self, target_error: float, z: float = Z_99_7, min_samples: int = 30
+    ) -> bool:
+        """
+        True once there are at least `min_samples` samples and the relative
+        error bound is at most `target_error`.
+
+        `min_samples` keeps a few similar samples at the start of the program
+        from stopping the sampling too early. The error bound assumes enough
+        samples for the central limit theorem to hold.
+        """
+        return (
+            self.num_samples >= min_samples
+            and self.relative_error(z) <= target_error
+        )
+
+
+def required_samples(
+    coefficient_of_variation: float, target_error: float, z: float = Z_99_7
+) -> int:
+    """
+    The minimum number of samples `n` so that `z * V / sqrt(n)` is at most
+    `target_error`.
+    """
+    if target_error <= 0:
+        raise ValueError("target_error must be positive.")
+    return max(
+        2, math.ceil((z * coefficient_of_variation / target_error) ** 2)
+    )
+
+
+def sampling_interval(
+    num_samples: int, program_length: int, unit_size: int
+) -> int:
+    """
+    The SMARTS sampling interval `k` that takes `num_samples` samples of
+    `unit_size` instructions from a program with `program_length`
+    instructions.
+    """
+    return max(1, program_length // (num_samples * unit_size))
+
+
+def read_smarts_samples(
+    stats_file: Union[str, Path],
+    stat_name: str,
+    unit_size: int,
+    tolerance: float = 0.05,
+    counter_name: Optional[str] = None,
+) -> List[float]:
+    """
+    Read the value of a stat from every SMARTS sample in a stats file.
+
+    SMARTS.py resets the stats at the start of every detailed unit and dumps
+    them at its end. A dump is counted as a sample if the committed
+    instructions of the detailed core (`counter_name`) are within
+    `tolerance` of `unit_size`. `simInsts` cannot be used for this because
+    `m5.stats.reset()` does not reset it.
+
+    gem5 also dumps the stats when the simulation ends. The detailed core is
+    switched out by then, so that dump repeats the last sample and is
+    skipped.
+
+    :param stats_file: Path to the stats file.
+    :param stat_name: Name of the stat to read, e.g.,
+    `board.processor.switch.core.ipc`.
+    :param unit_size: The sampling unit size `U` used in the simulation.
+    :param tolerance: Allowed relative difference between the committed
+    instructions and `unit_size`. The detailed core can commit a few
+    instructions past the end of the unit.
+    :param counter_name: The stat with the committed instructions of the
+    detailed core. Defaults to `commitStats0.numInsts` of the core of
+    `stat_name`.
+    """
+    if counter_name is None:
+        counter_name = (
+            stat_name.rsplit(".", 1)[0] + ".commitStats0.numInsts"
+        )
+    samples = []
+    last_is_sample = False
+    for dump in iter_stat_dumps(stats_file, [stat_name, counter_name]):
+        last_is_sample = (
+            stat_name in dump
+            and counter_name in dump
+            and abs(dump[counter_name] - unit_size) <= tolerance * unit_size
+        )
+        if last_is_sample:
+            samples.append((dump[counter_name], dump[stat_name]))
+    if last_is_sample and len(samples) > 1 and samples[-1] == samples[-2]:
+        samples.pop()
+    return [value for _, value in samples]
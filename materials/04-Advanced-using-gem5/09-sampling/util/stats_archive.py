@@ -0,0 +1,232 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+A columnar NumPy archive of the dumps in a gem5 stats file.
+
+`build_stats_archive` converts a stats file with many dumps (SMARTS samples,
+periodic dumps or the ROI dumps written by `roi_manager.handle_workend`) into
+a `dumps x stats` matrix. The matrix is saved as `values.npy` next to a
+`names.json` file that maps every column to a stat name. The matrix is stored
+in Fortran (column-major) order so that reading all of the dumps of one stat
+only touches one contiguous piece of the file when it is memory-mapped.
+
+Usage
+-----
+
+```sh
+python3 -m util.stats_archive 03-SMARTS/m5out/stats.txt smarts-archive
+```
+
+```python
+from util.stats_archive import StatsArchive
+
+archive = StatsArchive.load("smarts-archive")
+ipc = archive.column("board.processor.switch.core.ipc")
+l2_misses = archive.select("*.l2-cache-*.overallMisses::total")
+```
+"""
+
+import argparse
+import json
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from .stats_reader import StatWhitelist, iter_stat_dumps
+
+VALUES_FILE_NAME = "values.npy"
+NAMES_FILE_NAME = "names.json"
+
+# Number of dumps that are buffered before they are written to the archive.
+_BLOCK_SIZE = 256
+
+
+class StatsArchive:
+    """
+    A `dumps x stats` matrix together with the name of every column.
+
+    Stats that are missing from a dump are stored as NaN.
+    """
+
+    def __init__(self, values: np.ndarray, names: List[str]):
+        if values.ndim != 2 or values.shape[1] != len(names):
+            raise ValueError(
+                f"values has shape {values.shape}, "
+                f"expected (num_dumps, {len(names)})."
+            )
+        self._values = values
+        self._names = names
+        self._columns = {name: i for i, name in enumerate(names)}
+
+    @classmethod
+    def load(
+        cls, archive_dir: Union[str, Path], mmap: bool = True
+    ) -> "StatsArchive":
+        """
+        :param archive_dir: Directory written by `build_stats_archive`.
+        :param mmap: If True the matrix is memory-mapped read-only instead of
+        being read into memory.
+        """
+        archive_dir = Path(archive_dir)
+        values = np.load(
+            archive_dir / VALUES_FILE_NAME, mmap_mode="r" if mmap else None
+        )
+        with open(archive_dir / NAMES_FILE_NAME, "r") as f:
+            names = json.load(f)
+        return cls(values, names)
+
+    def get_names(self) -> List[str]:
+        return self._names
+
+    def get_num_dumps(self) -> int:
+        return self._values.shape[0]
+
+    def get_values(self) -> np.ndarray:
+        return self._values
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Return the value of one stat in every dump.
+        """
+        if not name in self._columns:
+            raise KeyError(f"{name} is not in the archive.")
+        return self._values[:, self._columns[name]]
+
+    def match(self, pattern: str) -> List[str]:
+        """
+        Return the names of all of the stats that match a glob pattern.
+        """
+        return [name for name in self._names if fnmatchcase(name, pattern)]
+
+    def select(self, *patterns: str) -> Dict[str, np.ndarray]:
+        """
+        Return the columns of all of the stats that match any of the glob
+        patterns.
+        """
+        selected = {}
+        for pattern in patterns:
+            for name in self.match(pattern):
+                selected[name] = self.column(name)
+        return selected
+
+    def dump(self, index: int) -> Dict[str, float]:
+        """
+        Return one dump as a dictionary from stat name to value.
+        """
+        row = self._values[index]
+        return {
+            name: float(row[column])
+            for name, column in self._columns.items()
+            if not np.isnan(row[column])
+        }
+
+
+def build_stats_archive(
+    stats_file: Union[str, Path],
+    archive_dir: Union[str, Path],
+    whitelist: Optional[Iterable[str]] = None,
+) -> StatsArchive:
+    """
+    Convert a stats file into an archive in `archive_dir`.
+
+    The stats file is read twice: once to find the names of the stats and
+    the number of dumps and once to fill the matrix. Neither pass holds more
+    than `_BLOCK_SIZE` dumps in memory.
+
+    :param stats_file: Path to the stats file.
+    :param archive_dir: Directory to write the archive to. It is created if
+    it does not exist.
+    :param whitelist: Optional list of stat names or glob patterns to keep.
+    """
+    if whitelist is not None:
+        whitelist = StatWhitelist(whitelist)
+
+    columns: Dict[str, int] = {}
+    num_dumps = 0
+    for dump in iter_stat_dumps(stats_file, whitelist):
+        for name in dump:
+            if not name in columns:
+                columns[name] = len(columns)
+        num_dumps += 1
+
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    values = np.lib.format.open_memmap(
+        archive_dir / VALUES_FILE_NAME,
+        mode="w+",
+        dtype=np.float64,
+        shape=(num_dumps, len(columns)),
+        fortran_order=True,
+    )
+
+    block = np.full((_BLOCK_SIZE, len(columns)), np.nan)
+    start = 0
+    filled = 0
+    for dump in iter_stat_dumps(stats_file, whitelist):
+        row = block[filled]
+        for name, value in dump.items():
+            row[columns[name]] = value
+        filled += 1
+        if filled == _BLOCK_SIZE:
+            values[start : start + filled] = block
+            start += filled
+            filled = 0
+            block.fill(np.nan)
+    values[start : start + filled] = block[:filled]
+    values.flush()
+    del values
+
+    names = list(columns)
+    with open(archive_dir / NAMES_FILE_NAME, "w") as f:
+        json.dump(names, f)
+
+    return StatsArchive.load(archive_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert a multi-dump stats file into a NumPy archive."
+    )
+    parser.add_argument("stats_file", type=str)
+    parser.add_argument("archive_dir", type=str)
+    parser.add_argument(
+        "--stat",
+        type=str,
+        action="append",
+        default=None,
+        help="Stat name or glob pattern to keep. Can be given many times. "
+        "All stats are kept if it is not given.",
+    )
+    args = parser.parse_args()
+
+    archive = build_stats_archive(args.stats_file, args.archive_dir, args.stat)
+    print(
+        f"Wrote {archive.get_num_dumps()} dumps of "
+        f"{len(archive.get_names())} stats to {args.archive_dir}"
+    )
@@ -0,0 +1,135 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+A streaming reader for gem5 stats files that hold more than one dump.
+
+Every call to `m5.stats.dump()` appends a new block to `stats.txt` between a
+"Begin Simulation Statistics" and an "End Simulation Statistics" marker. With
+SMARTS (one dump per sample) or periodic dumps this file grows very large.
+`iter_stat_dumps` goes through the file once and yields one dump at a time so
+only a single dump is ever held in memory.
+
+Example
+-------
+
+```python
+from util.stats_reader import iter_stat_dumps
+
+for dump in iter_stat_dumps("m5out/stats.txt", ["simInsts"]):
+    print(dump["simInsts"])
+```
+"""
+
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+BEGIN_MARKER = "Begin Simulation Statistics"
+END_MARKER = "End Simulation Statistics"
+
+_GLOB_CHARACTERS = set("*?[")
+
+
+class StatWhitelist:
+    """
+    Decides which stats are kept when reading a stats file.
+
+    Patterns without glob characters are compared by exact name. Patterns
+    with glob characters (`*`, `?`, `[`) are matched with `fnmatch`. The
+    decision for every name is cached since every dump repeats the same names.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self._names = set()
+        self._patterns = []
+        for pattern in patterns:
+            if _GLOB_CHARACTERS.intersection(pattern):
+                self._patterns.append(pattern)
+            else:
+                self._names.add(pattern)
+        self._decisions: Dict[str, bool] = {}
+
+    def __contains__(self, name: str) -> bool:
+        decision = self._decisions.get(name)
+        if decision is None:
+            decision = name in self._names or any(
+                fnmatchcase(name, pattern) for pattern in self._patterns
+            )
+            self._decisions[name] = decision
+        return decision
+
+
+def iter_stat_dumps(
+    stats_file: Union[str, Path],
+    whitelist: Optional[Iterable[str]] = None,
+) -> Iterator[Dict[str, float]]:
+    """
+    Yield every dump in a stats file as a dictionary from stat name to value.
+
+    :param stats_file: Path to the stats file.
+    :param whitelist: Optional list of stat names or glob patterns. When it is
+    given only the matching stats are returned.
+
+    Lines whose first value is not a number are skipped.
+    """
+    if whitelist is not None and not isinstance(whitelist, StatWhitelist):
+        whitelist = StatWhitelist(whitelist)
+
+    with open(stats_file, "r") as f:
+        dump = None
+        for line in f:
+            if dump is None:
+                if BEGIN_MARKER in line:
+                    dump = {}
+                continue
+            if END_MARKER in line:
+                yield dump
+                dump = None
+                continue
+            tokens = line.split(None, 2)
+            if len(tokens) < 2:
+                continue
+            name = tokens[0]
+            if whitelist is not None and name not in whitelist:
+                continue
+            try:
+                dump[name] = float(tokens[1])
+            except ValueError:
+                continue
+
+
+def iter_stat_values(
+    stats_file: Union[str, Path], name: str
+) -> Iterator[float]:
+    """
+    Yield the value of a single stat from every dump in a stats file.
+
+    Dumps that do not have the stat are skipped.
+    """
+    for dump in iter_stat_dumps(stats_file, [name]):
+        if name in dump:
+            yield dump[name]
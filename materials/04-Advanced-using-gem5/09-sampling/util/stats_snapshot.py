@@ -0,0 +1,359 @@
+# Copyright (c) 2024 The Regents of the University of California
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Compact binary stats snapshots for sample-heavy runs.
+
+`m5.stats.dump()` writes every stat in the system as text each time it is
+called. When a simulation dumps thousands of times (e.g., once per SMARTS
+sample) most of the time and disk space goes to stats nobody reads.
+`StatsSnapshotWriter` instead reads a fixed list of stats and appends their
+values to a binary file.
+
+The file starts with a header that is written once:
+
+- the magic bytes `gem5sts\\0` and a little-endian uint32 format version,
+- a uint32 with the number of stats,
+- the name of every stat as a uint16 length followed by UTF-8 bytes.
+
+Every snapshot after the header is one fixed size record: the current tick
+as a uint64 followed by one float64 per stat. Since all records have the
+same size, `read_stats_snapshots` loads the whole file into NumPy arrays with
+a single read.
+
+`StatsSubsetWriter` writes the same kind of stat subset as text in the
+stats.txt format instead, for when the dumps should stay readable by people
+and by the existing stats.txt parsers.
+
+Example
+-------
+
+```python
+from util.stats_snapshot import StatsSnapshotWriter
+
+writer = StatsSnapshotWriter("m5out/stats.bin", ["simInsts", "*.core.ipc"])
+
+def on_workend():
+    while True:
+        writer.dump()
+        yield True
+```
+"""
+
+import struct
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+MAGIC = b"gem5sts\0"
+VERSION = 1
+
+# The stats most analyses of a sample or a region of interest need.
+DEFAULT_SUBSET_STATS = (
+    "simInsts",
+    "simTicks",
+    "*.ipc",
+    "*.numCycles",
+    # The instructions of every core since the last reset, which
+    # util/smarts_estimator.py uses to find the SMARTS samples.
+    "*.commitStats0.numInsts",
+    "*.overallAccesses",
+    "*.overallMisses",
+)
+
+_GLOB_CHARACTERS = set("*?[")
+
+
+def _walk_stat_groups(group, prefix: str):
+    """
+    Yield `(name, info)` for every stat in a stat group and its children.
+    """
+    for info in group.getStats():
+        yield prefix + info.name, info
+    for name, child in group.getStatGroups().items():
+        yield from _walk_stat_groups(child, f"{prefix}{name}.")
+
+
+def _stat_getter(name: str, info) -> Tuple[List[str], object]:
+    """
+    Split a stat into its scalar values.
+
+    Scalars give one value. Vectors and formulas give one value per element
+    named `name::subname` (or just `name` if they only have one element).
+    Distributions and histograms are not supported and give no values.
+
+    :returns: The names of the values and a function that returns the
+    current values as a list.
+    """
+    import _m5.stats
+
+    if isinstance(info, _m5.stats.ScalarInfo):
+        return [name], lambda: [info.value]
+    if isinstance(info, _m5.stats.VectorInfo):
+        size = len(info.result)
+        if size == 1:
+            return [name], lambda: info.result
+        subnames = list(getattr(info, "subnames", []))
+        names = []
+        for index in range(size):
+            if index < len(subnames) and subnames[index]:
+                names.append(f"{name}::{subnames[index]}")
+            else:
+                names.append(f"{name}::{index}")
+        return names, lambda: info.result
+    return [], lambda: []
+
+
+def resolve_stats(patterns: Iterable[str]) -> List[Tuple[List[str], object]]:
+    """
+    Find the stats that match a list of names or glob patterns.
+
+    This has to be called after the simulation has been instantiated (e.g.,
+    from an exit event handler).
+
+    :returns: A list of `(names, getter)` pairs, one per stat. Calling the
+    getter returns the current values of the stat as a list.
+    """
+    from m5.objects import Root
+
+    patterns = list(patterns)
+    root = Root.getInstance()
+    resolved = []
+    if any(_GLOB_CHARACTERS.intersection(pattern) for pattern in patterns):
+        for name, info in _walk_stat_groups(root, ""):
+            if any(fnmatchcase(name, pattern) for pattern in patterns):
+                names, getter = _stat_getter(name, info)
+                if names:
+                    resolved.append((names, getter))
+    else:
+        # Exact names can be looked up directly instead of walking the tree.
+        for name in patterns:
+            info = root.resolveStat(name)
+            names, getter = (
+                _stat_getter(name, info) if info is not None else ([], None)
+            )
+            if not names:
+                raise ValueError(f"Could not find the stat {name}.")
+            resolved.append((names, getter))
+    if not resolved:
+        raise ValueError(f"No stats match {patterns}.")
+    return resolved
+
+
+def read_stat_values(resolved: List[Tuple[List[str], object]]) -> List[float]:
+    """
+    Read the current values of stats returned by `resolve_stats`.
+    """
+    values = []
+    for _, getter in resolved:
+        values.extend(getter())
+    return values
+
+
+class StatsSnapshotWriter:
+    """
+    Appends binary snapshots of a list of stats to a file.
+
+    The stats are resolved on the first call to `dump` (the simulation has to
+    be instantiated by then), which also truncates the file unless `append`
+    is set. Every later call only reads the resolved stats and writes one
+    record.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        patterns: Iterable[str],
+        append: bool = False,
+    ):
+        """
+        :param path: File to write the snapshots to.
+        :param patterns: Stat names or glob patterns to include in every
+        snapshot.
+        :param append: Append to the snapshots already in the file instead
+        of replacing them. The file must have snapshots of the same stats.
+        """
+        self._path = Path(path)
+        self._patterns = list(patterns)
+        self._append = append
+        self._stats = None
+        self._record = None
+        self._file = None
+
+    def get_names(self) -> List[str]:
+        self._resolve()
+        return [name for names, _ in self._stats for name in names]
+
+    def _resolve(self) -> None:
+        if self._stats is not None:
+            return
+        self._stats = resolve_stats(self._patterns)
+        names = self.get_names()
+        self._record = struct.Struct(f"<Q{len(names)}d")
+
+        if (
+            self._append
+            and self._path.exists()
+            and self._path.stat().st_size > 0
+        ):
+            existing_names, _, _ = _read_header(self._path)
+            if existing_names != names:
+                raise ValueError(
+                    f"{self._path} has snapshots of different stats."
+                )
+            self._file = open(self._path, "ab")
+        else:
+            self._file = open(self._path, "wb")
+            self._file.write(_pack_header(names))
+
+    def dump(self, tick: Optional[int] = None) -> None:
+        """
+        Append a snapshot of the current value of every stat.
+
+        :param tick: The tick to record with the snapshot. Defaults to the
+        current tick.
+        """
+        import m5
+
+        self._resolve()
+        if tick is None:
+            tick = m5.curTick()
+        self._file.write(
+            self._record.pack(tick, *read_stat_values(self._stats))
+        )
+        # Keep the file readable while the simulation is still running.
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class StatsSubsetWriter:
+    """
+    Appends text dumps of a list of stats to a file.
+
+    Every dump has the same format as a dump in stats.txt (without the stat
+    descriptions), so the file can be read with `util.stats_reader` or any
+    other stats.txt parser. As with `StatsSnapshotWriter`, the stats are
+    resolved on the first call to `dump`, which also truncates the file.
+    """
+
+    def __init__(self, path: Union[str, Path], patterns: Iterable[str]):
+        """
+        :param path: File to write the dumps to.
+        :param patterns: Stat names or glob patterns to include in every
+        dump.
+        """
+        self._path = Path(path)
+        self._patterns = list(patterns)
+        self._stats = None
+        self._names = None
+        self._file = None
+
+    def get_names(self) -> List[str]:
+        self._resolve()
+        return list(self._names)
+
+    def _resolve(self) -> None:
+        if self._stats is not None:
+            return
+        self._stats = resolve_stats(self._patterns)
+        self._names = [name for names, _ in self._stats for name in names]
+        self._width = max(len(name) for name in self._names) + 1
+        self._file = open(self._path, "w")
+
+    def dump(self) -> None:
+        """
+        Append a dump of the current value of every stat.
+        """
+        self._resolve()
+        lines = ["\n---------- Begin Simulation Statistics ----------\n"]
+        for name, value in zip(self._names, read_stat_values(self._stats)):
+            lines.append(f"{name:<{self._width}} {_format_value(value)}\n")
+        lines.append("---------- End Simulation Statistics   ----------\n")
+        self._file.write("".join(lines))
+        # Keep the file readable while the simulation is still running.
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _format_value(value: float) -> str:
+    # Like stats.txt: integers without a fraction, other values with six
+    # decimals.
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return f"{value:.6f}"
+
+
+def _pack_header(names: List[str]) -> bytes:
+    header = [MAGIC, struct.pack("<II", VERSION, len(names))]
+    for name in names:
+        encoded = name.encode("utf-8")
+        header.append(struct.pack("<H", len(encoded)))
+        header.append(encoded)
+    return b"".join(header)
+
+
+def _read_header(path: Union[str, Path]) -> Tuple[List[str], int, int]:
+    """
+    :returns: The names of the stats, the size of the header in bytes and
+    the format version.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a stats snapshot file.")
+        version, num_names = struct.unpack("<II", f.read(8))
+        if version != VERSION:
+            raise ValueError(
+                f"{path} has version {version}, expected {VERSION}."
+            )
+        names = []
+        for _ in range(num_names):
+            (length,) = struct.unpack("<H", f.read(2))
+            names.append(f.read(length).decode("utf-8"))
+        return names, f.tell(), version
+
+
+def read_stats_snapshots(path: Union[str, Path]):
+    """
+    Read a file written by `StatsSnapshotWriter`.
+
+    :returns: The names of the stats, a `(num_snapshots,)` array with the tick
+    of every snapshot and a `(num_snapshots, num_stats)` array of values.
+    """
+    import numpy as np
+
+    names, header_size, _ = _read_header(path)
+    record = np.dtype([("tick", "<u8"), ("values", "<f8", (len(names),))])
+    records = np.fromfile(path, dtype=record, offset=header_size)
+    return names, records["tick"], records["values"]